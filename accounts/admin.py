@@ -63,56 +63,68 @@ from django.contrib.auth.models import *
 from django.contrib.sessions.models import Session
 
 from django.contrib.admin import ModelAdmin, register
+from django.utils.html import format_html
 from accounts.models import *
+from accounts.search import UserSearchMixin
+from core.autoadmin import LeanModelAdmin, autoregister
+
+
+class UserRelatedSearchMixin(UserSearchMixin):
+    # Profile and <User Type>More: searched by their user
+    user_search_path = 'user'
+    search_fields = ('user__username',)
+    # their __str__ reads user.username
+    list_select_related = ('user',)
 
 
 @register(Address)
-class MaterialAddressAdmin(ModelAdmin):
+class MaterialAddressAdmin(LeanModelAdmin):
     icon_name = 'place'
 
 @register(ControllerMore)
-class MaterialControllerMoreAdmin(ModelAdmin):
+class MaterialControllerMoreAdmin(UserRelatedSearchMixin, LeanModelAdmin):
     icon_name = 'power'
 
 @register(Education)
-class MaterialEducationAdmin(ModelAdmin):
+class MaterialEducationAdmin(LeanModelAdmin):
     icon_name = 'school'
 
 @register(EmployeeMore)
-class MaterialEmployeeMoreAdmin(ModelAdmin):
+class MaterialEmployeeMoreAdmin(UserRelatedSearchMixin, LeanModelAdmin):
     icon_name = 'wc'
 
 @register(GuardianMore)
-class MaterialGuardianMoreAdmin(ModelAdmin):
+class MaterialGuardianMoreAdmin(UserRelatedSearchMixin, LeanModelAdmin):
     icon_name = 'person_pin'
 @register(StudentMore)
-class MaterialStudentMoreAdmin(ModelAdmin):
+class MaterialStudentMoreAdmin(UserRelatedSearchMixin, LeanModelAdmin):
     icon_name = 'people_outline'
 @register(TeacherMore)
-class MaterialTeacherMoreAdmin(ModelAdmin):
+class MaterialTeacherMoreAdmin(UserRelatedSearchMixin, LeanModelAdmin):
     icon_name = 'supervisor_account'
 
 @register(Profile)
-class MaterialProfileAdmin(ModelAdmin):
+class MaterialProfileAdmin(UserRelatedSearchMixin, LeanModelAdmin):
     icon_name = 'contacts'
 
+@register(User)
+class MaterialUserAdmin(UserSearchMixin, LeanModelAdmin):
+    icon_name = 'person'
+    list_display = ('avatar_preview', 'username', 'email', 'phone', 'types', 'is_staff', 'is_active')
+    # matched by accounts.search.search_users, not by these lookups
+    search_fields = ('username', 'first_name', 'last_name', 'email', 'phone')
+    readonly_fields = ('avatar_preview',)
 
+    @admin.display(description='avatar')
+    def avatar_preview(self, obj):
+        # the small variant, never the full size upload
+        return format_html('<img src="{}" width="32" height="32" alt="">', obj.avatar_thumbnail_url)
 
 
-class ListAdminMixin(object):
-    def __init__(self, model, admin_site):
-        self.list_display = [field.name for field in model._meta.fields]
-        super(ListAdminMixin, self).__init__(model, admin_site)
-
 
-models = apps.get_models()
 
-for model in models:
-    admin_class = type('AdminClass', (ListAdminMixin, admin.ModelAdmin), {})
-    try:
-        admin.site.register(model, admin_class)
-    except admin.sites.AlreadyRegistered:
-        pass
+# every other model: list_display and list_select_related derived from its fields
+autoregister(admin.site, apps.get_models())
 
 admin.site.unregister(ContentType)
 admin.site.unregister(Teacher)
@@ -7,4 +7,8 @@ class AccountsConfig(AppConfig):
     name = 'accounts'
     icon_name = 'person'
 
+    def ready(self):
+        # connect permission cache invalidation receivers
+        from . import backends  # noqa: F401
+
 
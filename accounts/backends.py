@@ -0,0 +1,114 @@
+# accounts.backends.py
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+
+User = get_user_model()
+
+PERMISSIONS_VERSION_KEY = 'perms:version'
+
+
+def permissions_cache():
+    return caches[getattr(settings, 'PERMISSIONS_CACHE', 'default')]
+
+
+def permissions_version():
+    '''
+    Current permissions version. Bumping it invalidates every cached permission set.
+    '''
+    return permissions_cache().get_or_set(PERMISSIONS_VERSION_KEY, 1, timeout=None)
+
+
+def permissions_cache_key(user_id, is_superuser=False, version=None):
+    '''
+    `is_superuser` is part of the key: a superuser has every permission,
+    so the set changes with the flag, and a save changing it sends no m2m_changed.
+    '''
+    if version is None:
+        version = permissions_version()
+    return 'perms:%s:%s:%d' % (version, user_id, bool(is_superuser))
+
+
+def invalidate_all_permissions(*args, **kwargs):
+    cache = permissions_cache()
+    try:
+        cache.incr(PERMISSIONS_VERSION_KEY)
+    except ValueError:
+        # version key expired or evicted, start over
+        cache.set(PERMISSIONS_VERSION_KEY, 1, timeout=None)
+
+
+def invalidate_user_permissions(user_ids):
+    version = permissions_version()
+    permissions_cache().delete_many([
+        permissions_cache_key(user_id, is_superuser, version)
+        for user_id in user_ids for is_superuser in (False, True)
+    ])
+
+
+class CachedModelBackend(ModelBackend):
+    '''
+    ModelBackend keeping each user's effective permission set (own and groups',
+    proxy models included) in the `PERMISSIONS_CACHE` cache across requests.
+    Entries are keyed by user id, is_superuser and a permissions version
+    counter and are invalidated by the receivers below. is_active is read
+    from the user itself, an inactive user has no permission.
+    '''
+
+    def get_user(self, user_id):
+        '''
+        The request's user, with its payment status (reverse one-to-one) in the same query.
+        '''
+        try:
+            user = User._default_manager.select_related('payment_status').get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            cache = permissions_cache()
+            key = permissions_cache_key(user_obj.pk, user_obj.is_superuser)
+            perms = cache.get(key)
+            if perms is None:
+                perms = super().get_all_permissions(user_obj)
+                cache.set(key, perms, getattr(settings, 'PERMISSIONS_CACHE_TIMEOUT', 300))
+            user_obj._perm_cache = perms
+        return user_obj._perm_cache
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_permissions_changed_handler(sender, instance, action, reverse, pk_set, **kwargs):
+    '''
+    user.groups / user.user_permissions (or group.user_set) changed.
+    '''
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif pk_set:
+        user_ids = list(pk_set)
+    else:
+        # group.user_set.clear(): members are unknown here
+        transaction.on_commit(invalidate_all_permissions)
+        return
+    transaction.on_commit(lambda: invalidate_user_permissions(user_ids))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed_handler(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidate_all_permissions)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted_handler(sender, **kwargs):
+    transaction.on_commit(invalidate_all_permissions)
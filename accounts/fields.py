@@ -0,0 +1,31 @@
+# accounts.fields.py
+from django.db import models
+from django.db.models import Lookup
+
+
+class TypesMaskField(models.PositiveIntegerField):
+    '''
+    Denormalized bitmask of `User.types` (see accounts.registry.types_mask).
+    Supports `has_all` and `has_any` lookups, i.e.
+        User.objects.filter(types_mask__has_all=types_mask([2, 3]))
+    '''
+
+
+@TypesMaskField.register_lookup
+class HasAllBits(Lookup):
+    lookup_name = 'has_all'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '(%s & %s) = %s' % (lhs, rhs, rhs), lhs_params + rhs_params + rhs_params
+
+
+@TypesMaskField.register_lookup
+class HasAnyBits(Lookup):
+    lookup_name = 'has_any'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '(%s & %s) <> 0' % (lhs, rhs), lhs_params + rhs_params
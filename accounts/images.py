@@ -0,0 +1,122 @@
+# accounts.images.py
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AVATAR = 'accounts/user/avatar/default.png'
+
+_executor = None
+
+
+def avatar_sizes():
+    # {'<variant>': <max side in px>}
+    return getattr(settings, 'AVATAR_THUMBNAIL_SIZES', {'sm': 64, 'md': 256})
+
+
+def variant_name(name, variant):
+    '''
+    Name of an avatar variant next to the original:
+        accounts/user/avatar/1/photo.png -> accounts/user/avatar/1/photo_sm.png
+    '''
+    base, extension = os.path.splitext(name)
+    return '%s_%s%s' % (base, variant, extension)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'AVATAR_WORKERS', 2),
+            thread_name_prefix='avatar',
+        )
+    return _executor
+
+
+def enqueue_avatar(user_id, name):
+    '''
+    Process an uploaded avatar in the background, the request doesn't wait for it.
+    '''
+    if not name or name == DEFAULT_AVATAR:
+        return None
+    return get_executor().submit(_run, user_id, name)
+
+
+def _run(user_id, name):
+    close_old_connections()
+    try:
+        process_avatar(user_id, name)
+    except Exception:
+        logger.exception('avatar processing failed for user %s (%s)', user_id, name)
+    finally:
+        close_old_connections()
+
+
+def _encode(image, image_format):
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    # a fresh `info` drops EXIF, ICC and text chunks
+    image.info = {}
+    buffer = BytesIO()
+    image.save(buffer, format=image_format)
+    return ContentFile(buffer.getvalue())
+
+
+def process_avatar(user_id, name):
+    '''
+    Validate the original, strip its metadata, write the fixed size variants
+    next to it and record its dimensions. Invalid images are replaced by the
+    default avatar.
+    '''
+    from accounts.models import User
+    from accounts.utils import FileUploadTo
+
+    field = User._meta.get_field('avatar')
+    storage = field.storage
+    try:
+        with storage.open(name) as original:
+            Image.open(original).verify()
+            original.seek(0)
+            image = Image.open(original)
+            image_format = image.format
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, SyntaxError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning('invalid avatar of user %s: %s', user_id, name)
+        User.objects.filter(pk=user_id, avatar=name).update(
+            avatar=DEFAULT_AVATAR, avatar_height_field=None, avatar_width_field=None)
+        storage.delete(name)
+        return
+
+    # the original without metadata, next to it or, when it was uploaded
+    # before the user had an id, in its final id folder. Written before the
+    # field is switched to it: the field always names a complete file.
+    target = name
+    if isinstance(field.upload_to, FileUploadTo) and field.upload_to.is_pending(name):
+        target = field.upload_to.finalize_name(User, user_id, name)
+    saved_name = storage.save(target, _encode(image, image_format))
+    for variant, side in avatar_sizes().items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail((side, side), Image.LANCZOS)
+        variant_target = variant_name(saved_name, variant)
+        if storage.exists(variant_target):
+            storage.delete(variant_target)
+        storage.save(variant_target, _encode(thumbnail, image_format))
+
+    switched = User.objects.filter(pk=user_id, avatar=name).update(
+        avatar=saved_name,
+        avatar_width_field=image.width,
+        avatar_height_field=image.height,
+    )
+    # the replaced file and, when the avatar changed meanwhile, the ones written here
+    for obsolete in ([name] if switched else [name, saved_name]):
+        storage.delete(obsolete)
+        for variant in avatar_sizes():
+            storage.delete(variant_name(obsolete, variant))
@@ -0,0 +1,62 @@
+import statistics
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts.models import TYPES, User
+from accounts.registry import types_mask
+
+
+def legacy_normalize_types(types, proxy_user_type=None):
+    # BaseCommonUserManager.normalize_types before the precomputed TypesNormalizer
+    User = get_user_model()
+    if not isinstance(types, (list, set)):
+        types = list()
+    elif isinstance(types, set):
+        types = list(types)
+    if proxy_user_type is not None:
+        types.append(proxy_user_type.value)
+    valid_types_set = set([t for t, _ in User.TypesChoices.choices])
+    types = list(valid_types_set.intersection(set(types)))
+    types.sort()
+    return types
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the `types` normalization User.save() runs, the former '
+        'normalize_types + types_mask against TYPES (accounts.registry.TypesNormalizer).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=100000,
+                            help='normalizations per timed run')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='timed runs per variant and input')
+
+    def handle(self, *args, **options):
+        proxy = User.TypesChoices.TEACHER
+        inputs = {
+            'empty': [],
+            'one': [User.TypesChoices.STUDENT],
+            'messy': [5, 3, 3, 1, 42, 2],
+        }
+
+        def legacy(types):
+            normalized = legacy_normalize_types(list(types), proxy)
+            return normalized, types_mask(normalized)
+
+        def current(types):
+            mask = TYPES.mask(types, proxy)
+            return list(TYPES.for_mask(mask)), mask
+
+        for name, types in inputs.items():
+            assert legacy(types) == current(types), name
+            for label, func in (('legacy', legacy), ('current', current)):
+                timings = timeit.repeat(
+                    lambda: func(types), number=options['number'], repeat=options['repeat'])
+                per_call = [timing / options['number'] * 1e9 for timing in timings]
+                self.stdout.write(
+                    f'{name:<6} {label:<8} median {statistics.median(per_call):8.1f} ns/save'
+                    f'   min {min(per_call):8.1f} ns/save')
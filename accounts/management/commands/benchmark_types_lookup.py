@@ -0,0 +1,84 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from accounts.models import User
+from accounts.registry import types_mask, user_types
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the `types` predicates of the proxy managers (GIN indexed '
+        'array containment vs bitmask) on a synthetic accounts_user table. '
+        'Synthetic rows are rolled back unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000,
+                            help='number of synthetic users to insert')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='timed runs per predicate and user type')
+        parser.add_argument('--keep', action='store_true',
+                            help='keep the synthetic users')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.populate(options['users'])
+            for user_type in user_types:
+                predicates = {
+                    'gin': User.objects.filter(types__contains=[user_type.value]),
+                    'bitmask': User.objects.filter(
+                        types_mask__has_all=types_mask([user_type.value])),
+                }
+                for name, queryset in predicates.items():
+                    self.report(user_type, name, queryset, options['repeat'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def populate(self, count):
+        if count <= 0:
+            return
+        self.stdout.write(f'inserting {count} synthetic users...')
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO accounts_user (
+                    password, is_superuser, username, first_name, last_name,
+                    email, is_staff, is_active, date_joined, types, types_mask,
+                    sex, avatar, avatar_height_field, avatar_width_field,
+                    modified, is_phone_verified, is_email_verified,
+                    is_account_verified
+                )
+                SELECT '!', false, 'bench_' || s.g, '', '',
+                       'bench_' || s.g || '@example.com', false, true, now(),
+                       s.types,
+                       (SELECT COALESCE(SUM(1 << t), 0) FROM unnest(s.types) AS t),
+                       'P', 'accounts/user/avatar/default.png', 0, 0,
+                       now(), false, false, false
+                FROM (
+                    SELECT g, ARRAY(
+                        SELECT t FROM generate_series(1, %s) AS t
+                        WHERE random() < 0.3 AND g > 0
+                    )::smallint[] AS types
+                    FROM generate_series(1, %s) AS g
+                ) AS s
+            """, [len(user_types), count])
+            cursor.execute('ANALYZE accounts_user')
+        self.stdout.write(f'inserted in {time.perf_counter() - started:.1f}s')
+
+    def report(self, user_type, name, queryset, repeat):
+        sql, params = queryset.values('id').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (ANALYZE, BUFFERS) SELECT count(*) FROM (%s) AS q' % sql, params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset.count()
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{user_type.proxy_model.__name__} [{name}] '
+            f'median={statistics.median(timings):.2f}ms max={max(timings):.2f}ms'))
+        self.stdout.write(plan)
@@ -0,0 +1,53 @@
+import statistics
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from accounts.utils import FileUploadTo
+
+
+def legacy_upload_location(upload_to, instance, filename):
+    # path generation before the `_meta` labels: one ContentType lookup per upload
+    content_type = ContentType.objects.get_for_model(instance.__class__)
+    folder_name = upload_to.folder_name
+    if upload_to.plus_id:
+        folder_name = f'{folder_name}/{instance.pk}'
+    return "%s/%s/%s/%s" % (content_type.app_label, content_type.model,
+                            folder_name, upload_to.new_filename(filename))
+
+
+class Command(BaseCommand):
+    help = (
+        'Time upload path generation of FileUploadTo against the former '
+        'ContentType based one, with a cold and a warm ContentType cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10000,
+                            help='paths generated per timed run')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='timed runs per variant')
+
+    def handle(self, *args, **options):
+        upload_to = FileUploadTo('avatar', plus_id=True)
+        instance = User(pk=42)
+        variants = {
+            'meta': lambda: upload_to(instance, 'photo.png'),
+            'contenttype (warm)': lambda: legacy_upload_location(upload_to, instance, 'photo.png'),
+            'contenttype (cold)': lambda: (
+                ContentType.objects.clear_cache(),
+                legacy_upload_location(upload_to, instance, 'photo.png'),
+            ),
+        }
+        for name, generate in variants.items():
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                for _ in range(options['iterations']):
+                    generate()
+                timings.append((time.perf_counter() - started) / options['iterations'] * 1e6)
+            self.stdout.write(
+                f'{name:<20} median {statistics.median(timings):8.2f} us/path'
+                f'   max {max(timings):8.2f} us/path')
@@ -0,0 +1,78 @@
+import random
+import statistics
+import string
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from accounts.models import User
+from accounts.search import search_users
+
+FIRST_NAMES = ('anna', 'john', 'maria', 'rahim', 'karim', 'fatema', 'jakaria', 'sara', 'omar', 'lina')
+LAST_NAMES = ('smith', 'hossain', 'rahman', 'khan', 'ahmed', 'garcia', 'islam', 'miller', 'chowdhury')
+QUERIES = ('ann', 'john smi', 'rahman', 'hosain', 'user_1234', '@example', '0171', 'ka', 'zzzz')
+
+
+class Command(BaseCommand):
+    help = (
+        'Time accounts.search.search_users (autocomplete queries) and report the p95 '
+        'against USER_SEARCH_P95_MS. With --populate, synthetic users are inserted '
+        'first, inside a transaction rolled back at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--populate', type=int, default=0,
+                            help='synthetic users to insert before timing (i.e. 1000000)')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='timed runs per query')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['populate']:
+                self.populate(options['populate'], options['batch_size'])
+            timings = self.measure(options['repeat'])
+            transaction.set_rollback(True)
+
+        target = getattr(settings, 'USER_SEARCH_P95_MS', 50)
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        self.stdout.write(
+            f'{len(timings)} searches   median {statistics.median(timings):7.2f} ms'
+            f'   p95 {p95:7.2f} ms   max {max(timings):7.2f} ms   target p95 {target} ms')
+        if p95 > target:
+            self.stdout.write(self.style.WARNING('p95 above target'))
+        else:
+            self.stdout.write(self.style.SUCCESS('p95 within target'))
+
+    def populate(self, count, batch_size):
+        rng = random.Random(0)
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            User.objects.bulk_create([
+                User(
+                    username=f'user_{number}',
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    email=f'{number}.{"".join(rng.choices(string.ascii_lowercase, k=6))}@example.com',
+                    phone=f'+8801{700000000 + number}',
+                    password='!',
+                )
+                for number in range(offset, min(offset + batch_size, count))
+            ])
+        # fresh planner statistics, as autovacuum would have them
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE accounts_user')
+        self.stdout.write(f'{count} users inserted in {time.perf_counter() - started:.1f} s')
+
+    def measure(self, repeat):
+        timings = []
+        for query in QUERIES:
+            # first run warms the cache, not timed
+            list(search_users(query))
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(search_users(query))
+                timings.append((time.perf_counter() - started) * 1000)
+        return timings
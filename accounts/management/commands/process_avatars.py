@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from accounts.images import DEFAULT_AVATAR, enqueue_avatar
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Write the resized variants of avatars which have not been processed yet.'
+
+    def handle(self, *args, **options):
+        pending = (
+            User.objects
+            .filter(avatar_width_field__isnull=True)
+            .exclude(avatar__in=['', DEFAULT_AVATAR])
+            .values_list('id', 'avatar')
+        )
+        futures = [enqueue_avatar(user_id, name) for user_id, name in pending.iterator()]
+        for future in futures:
+            future.result()
+        self.stdout.write(self.style.SUCCESS('processed %s avatars' % len(futures)))
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from core.history import historied_models, retention_days
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete simple_history rows older than their model\'s HISTORY_RETENTION_DAYS, '
+        '`--chunk-size` rows per transaction so no lock is held for long.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*',
+                            help='model labels (i.e. accounts.Profile), all historied models by default')
+        parser.add_argument('--days', type=int,
+                            help='override HISTORY_RETENTION_DAYS for every model')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='seconds to wait between chunks, to spare replicas and other writers')
+        parser.add_argument('--keep-latest', action='store_true',
+                            help='never delete the most recent row of an object')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        models = historied_models()
+        if options['models']:
+            by_label = {model._meta.label_lower: model for model in models}
+            try:
+                models = [by_label[label.lower()] for label in options['models']]
+            except KeyError as error:
+                raise CommandError('%s has no history' % error)
+
+        for model in models:
+            days = options['days'] if options['days'] is not None else retention_days(model)
+            if days is None:
+                self.stdout.write('%s: kept, no retention' % model._meta.label)
+                continue
+            history = getattr(model, model._meta.simple_history_manager_attribute).model
+            expired = history.objects.filter(history_date__lt=timezone.now() - timezone.timedelta(days=days))
+            if options['keep_latest']:
+                pk = model._meta.pk.attname
+                # served by the (<pk>, history_date) index of TrackedHistoricalRecords
+                newer = history.objects.filter(**{
+                    pk: OuterRef(pk), 'history_date__gt': OuterRef('history_date')})
+                expired = expired.filter(Exists(newer))
+            if options['dry_run']:
+                self.stdout.write('%s: %s rows to delete' % (model._meta.label, expired.count()))
+                continue
+            deleted = self.prune(history, expired, options['chunk_size'], options['sleep'])
+            self.stdout.write(self.style.SUCCESS(
+                '%s: %s rows older than %s days deleted' % (model._meta.label, deleted, days)))
+
+    def prune(self, history, expired, chunk_size, sleep):
+        # oldest first through the history_date index, one short transaction per chunk
+        chunk = expired.order_by('history_date').values_list('history_id', flat=True)
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                ids = list(chunk[:chunk_size])
+                if not ids:
+                    return deleted
+                deleted += history.objects.filter(history_id__in=ids).delete()[0]
+            if sleep:
+                time.sleep(sleep)
@@ -0,0 +1,33 @@
+# Generated by Django 3.2 on 2026-10-18 15:40
+
+import accounts.fields
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_alter_user_sex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='types_mask',
+            field=accounts.fields.TypesMaskField(default=0, editable=False),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE accounts_user
+                SET types_mask = (
+                    SELECT COALESCE(SUM(DISTINCT 1 << t), 0) FROM unnest(types) AS t
+                )
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['types'], name='accounts_user_types_gin'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2 on 2026-10-18 09:27
+
+import accounts.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_user_types_mask'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, default='accounts/user/avatar/default.png', upload_to=accounts.utils.FileUploadTo('avatar')),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='avatar_height_field',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='avatar_width_field',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        # existing uploads have no variants yet, `manage.py process_avatars` writes them
+        migrations.RunSQL(
+            sql="""
+                UPDATE accounts_user
+                SET avatar_height_field = NULL, avatar_width_field = NULL
+                WHERE avatar <> 'accounts/user/avatar/default.png'
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2 on 2026-10-18 09:29
+
+import accounts.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_avatar_processing'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, default='accounts/user/avatar/default.png', upload_to=accounts.utils.FileUploadTo('avatar', plus_id=True)),
+        ),
+    ]
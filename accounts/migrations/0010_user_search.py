@@ -0,0 +1,75 @@
+# Generated by Django 3.2 on 2026-10-18 09:37
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+SEARCH_VECTOR = """
+    setweight(to_tsvector('simple', coalesce({row}username, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce({row}first_name, '') || ' ' || coalesce({row}last_name, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce({row}email, '')), 'C') ||
+    setweight(to_tsvector('simple', coalesce({row}phone, '')), 'D')
+"""
+
+CREATE_TRIGGER = """
+    CREATE FUNCTION accounts_user_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := %s;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER accounts_user_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF username, first_name, last_name, email, phone
+    ON accounts_user
+    FOR EACH ROW EXECUTE PROCEDURE accounts_user_search_vector_update();
+
+    UPDATE accounts_user SET search_vector = %s;
+""" % (SEARCH_VECTOR.format(row='NEW.'), SEARCH_VECTOR.format(row=''))
+
+DROP_TRIGGER = """
+    DROP TRIGGER IF EXISTS accounts_user_search_vector_trigger ON accounts_user;
+    DROP FUNCTION IF EXISTS accounts_user_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_user_avatar_storage'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='user',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(sql=CREATE_TRIGGER, reverse_sql=DROP_TRIGGER),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='accounts_user_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['username'], name='accounts_user_username_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['email'], name='accounts_user_email_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['first_name'], name='accounts_user_first_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['last_name'], name='accounts_user_last_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['phone'], name='accounts_user_phone_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
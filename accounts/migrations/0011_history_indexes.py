@@ -0,0 +1,45 @@
+# Generated by Django 3.2 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_user_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historicaladdress',
+            index=models.Index(fields=['id', 'history_date'], name='accounts_hi_id_26a081_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalcontrollermore',
+            index=models.Index(fields=['id', 'history_date'], name='accounts_hi_id_3158a3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicaleducation',
+            index=models.Index(fields=['id', 'history_date'], name='accounts_hi_id_ad5be3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalemployeemore',
+            index=models.Index(fields=['id', 'history_date'], name='accounts_hi_id_a90bca_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalguardianmore',
+            index=models.Index(fields=['id', 'history_date'], name='accounts_hi_id_5f1b78_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalprofile',
+            index=models.Index(fields=['id', 'history_date'], name='accounts_hi_id_867b01_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalstudentmore',
+            index=models.Index(fields=['id', 'history_date'], name='accounts_hi_id_d0f69f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalteachermore',
+            index=models.Index(fields=['id', 'history_date'], name='accounts_hi_id_e0829c_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2 on 2026-10-18 16:20
+
+import accounts.utils
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, default='accounts/user/avatar/default.png', max_length=255, storage=core.storage.media_storage, upload_to=accounts.utils.FileUploadTo('avatar', plus_id=True)),
+        ),
+    ]
@@ -1,26 +1,37 @@
 import datetime
+import logging
 from enum import unique
 
-from simple_history.models import HistoricalRecords
 from django.contrib import auth
 from django.contrib.auth.models import (AbstractBaseUser, BaseUserManager,
                                         PermissionsMixin)
+from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.mail import send_mail
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.db.models.signals import post_save
-from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from model_utils import FieldTracker
 from model_utils.models import TimeStampedModel
 from phonenumber_field.modelfields import PhoneNumberField
+from simple_history.utils import bulk_create_with_history
 
+from accounts.fields import TypesMaskField
+from accounts.images import DEFAULT_AVATAR, enqueue_avatar, variant_name
+from accounts.registry import TypesNormalizer, user_types
 from accounts.utils import FileUploadTo
+from core.history import TrackedHistoricalRecords, current_history_user
+from core.log import log_event
+from core.storage import media_storage
 
 from .validators import UnicodeUsernameValidator
 
+logger = logging.getLogger(__name__)
+
 
 class BaseCommonUserManager(BaseUserManager):
     """
@@ -30,33 +41,15 @@ class BaseCommonUserManager(BaseUserManager):
     @classmethod
     def normalize_types(cls, types: list, proxy_user_type=None):
         """
-        Normalize the types list by sorting and removing duplicate items.
+        Normalize the types list by sorting and removing duplicate and invalid items.
         params:
             types: `list` list of valid user types specified
-            proxy_user_type: `positive int`|`type(User.TypesChoices)` 
+            proxy_user_type: `positive int`|`User.TypesChoices`
                             default user type when creating user from proxy model.
                             E.g: Teacher.objects.create(username=...)
+        returns: `list` sorted valid types, see `TYPES` (accounts.registry.TypesNormalizer)
         """
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        if not isinstance(types, (list, set)):
-            types = list()
-        elif isinstance(types, set):
-            types = list(types)
-
-        print(
-            f"inside normalize_types. proxy_user_type={proxy_user_type}, class={type(proxy_user_type)}")
-        if (proxy_user_type is not None) and isinstance(proxy_user_type, (int, type(User.TypesChoices))):
-            if isinstance(proxy_user_type, type(User.TypesChoices)):
-                types.append(proxy_user_type.value)
-            else:
-                types.append(proxy_user_type.value)
-
-        valid_types_set = set([t for t, _ in User.TypesChoices.choices])
-        types_set_validated = valid_types_set.intersection(set(types))
-        types = list(types_set_validated)
-        types.sort()
-        return types
+        return list(TYPES.normalize(types, proxy_user_type))
 
     def _create_user(self, username, email, password, **extra_fields):
         """
@@ -78,10 +71,129 @@ class BaseCommonUserManager(BaseUserManager):
         extra_fields.setdefault('is_superuser', False)
         return self._create_user(username, email, password, **extra_fields)
 
+    def bulk_create_typed(self, users, batch_size=None, history_user=None,
+                          hashed_passwords=False):
+        """
+        Create many users together with their Profile and <User Type>More rows.
+        Unlike save(), this does not fire post_save per user: users, profiles and
+        every <User Type>More table are inserted with one bulk INSERT each
+        (per `batch_size` rows), history included, inside a single transaction.
+        params:
+            users: `iterable` of `dict` with User field values.
+                   `username` is required, `password` is the raw password
+                   (unusable password when missing).
+            batch_size: `positive int` rows per INSERT statement
+            history_user: `User` recorded as `history_user` of historical rows
+                          (default: the HistoryRequestMiddleware user)
+            hashed_passwords: `bool` `password` values are already hashed
+                              (i.e. by make_password in a process pool)
+        returns: `list` of created users (with ids)
+            E.g: Student.objects.bulk_create_typed([{'username': ..., 'email': ...}])
+        """
+        proxy_user_type = self.model.proxy_user_type()
+        objs = []
+        for fields in users:
+            fields = dict(fields)
+            username = fields.pop('username', None)
+            password = fields.pop('password', None)
+            if not username:
+                raise ValueError('The given username must be set')
+            fields['email'] = self.normalize_email(fields.get('email'))
+            mask = TYPES.mask(fields.get('types'), proxy_user_type)
+            fields['types'] = list(TYPES.for_mask(mask))
+            fields['types_mask'] = mask
+            user = self.model(
+                username=self.model.normalize_username(username), **fields)
+            if hashed_passwords and password:
+                user.password = password
+            else:
+                user.set_password(password)
+            objs.append(user)
+
+        history_user = history_user or current_history_user()
+        with transaction.atomic(using=self.db):
+            created = self.bulk_create(objs, batch_size=batch_size)
+            bulk_create_with_history(
+                [Profile(user=user) for user in created], Profile,
+                batch_size=batch_size, default_user=history_user)
+            more_objs = {}
+            for user in created:
+                for user_type in user.types:
+                    more_model = user_types[user_type].more_model
+                    more_objs.setdefault(more_model, []).append(more_model(user=user))
+            for more_model, objs in more_objs.items():
+                bulk_create_with_history(
+                    objs, more_model,
+                    batch_size=batch_size, default_user=history_user)
+        return created
+
+    def bulk_update_types(self, users, types=None, add=None, remove=None):
+        """
+        Change `types` of many users at once and reconcile their
+        <User Type>More rows in batched statements (see accounts.reconcile).
+        params:
+            users: `QuerySet` of users or `iterable` of users/ids
+            types: `list` new types replacing the current ones
+            add: `list` types to add to the current ones
+            remove: `list` types to remove from the current ones
+        returns: `int` number of users whose types changed
+            E.g: User.objects.bulk_update_types(qs, add=[User.TypesChoices.TEACHER])
+        """
+        from accounts.reconcile import reconcile_types
+
+        if isinstance(users, models.QuerySet):
+            queryset = users
+        else:
+            queryset = self.filter(
+                pk__in=[getattr(user, 'pk', user) for user in users])
+        add = TYPES.mask(add)
+        remove = TYPES.mask(remove)
+        if types is not None:
+            types = TYPES.mask(types)
+
+        changed = []
+        ids_by_mask = {}
+        touched_mask = 0
+        # lock the rows before reading `types`, in pk order, so that concurrent
+        # updates of the same users apply one after the other
+        rows = self.model._base_manager.using(self.db).filter(
+            pk__in=queryset.values('pk')).select_for_update().order_by('pk')
+        with transaction.atomic(using=self.db):
+            for user_id, current in rows.values_list('id', 'types'):
+                current_mask = TYPES.mask(current)
+                new_mask = types if types is not None else (current_mask | add) & ~remove
+                new = list(TYPES.for_mask(new_mask))
+                if new == list(current or ()):
+                    continue
+                changed.append((user_id, new))
+                ids_by_mask.setdefault(new_mask, []).append(user_id)
+                touched_mask |= current_mask ^ new_mask
+            # one UPDATE per distinct resulting `types` value
+            for new_mask, user_ids in ids_by_mask.items():
+                self.model._base_manager.using(self.db).filter(
+                    pk__in=user_ids).update(
+                        types=list(TYPES.for_mask(new_mask)), types_mask=new_mask,
+                        modified=timezone.now())
+            touched_types = set(TYPES.for_mask(touched_mask))
+            reconcile_types(changed, only_types=touched_types)
+        return len(changed)
+
     def with_perm(self, perm, is_active=True, include_superusers=True, backend=None, obj=None):
         # print(f"inside BaseCommonUserManager.with_perm. {self.__class__}")
         if backend is None:
             backends = auth._get_backends(return_tuples=True)
+            if obj is not None:
+                # only object permission backends can answer for `obj`
+                backends = [
+                    (b, path) for b, path in backends
+                    if getattr(b, 'supports_object_permissions', False)
+                ]
+            else:
+                # nor can object only backends answer without one
+                backends = [
+                    (b, path) for b, path in backends
+                    if getattr(b, 'supports_model_permissions', True)
+                ]
             if len(backends) == 1:
                 backend, _ = backends[0]
             else:
@@ -125,29 +237,21 @@ class UserManager(BaseCommonUserManager):
         return self._create_user(username, email, password, **extra_fields)
 
 
-class ControllerManager(BaseCommonUserManager):
-    def get_queryset(self, *args, **kwargs):
-        return super().get_queryset(*args, **kwargs).filter(types__contains=[User.TypesChoices.CONTROLLER])
-
-
-class TeacherManager(BaseCommonUserManager):
-    def get_queryset(self, *args, **kwargs):
-        return super().get_queryset(*args, **kwargs).filter(types__contains=[User.TypesChoices.TEACHER])
-
-
-class StudentManager(BaseCommonUserManager):
-    def get_queryset(self, *args, **kwargs):
-        return super().get_queryset(*args, **kwargs).filter(types__contains=[User.TypesChoices.STUDENT])
-
-
-class GuardianManager(BaseCommonUserManager):
-    def get_queryset(self, *args, **kwargs):
-        return super().get_queryset(*args, **kwargs).filter(types__contains=[User.TypesChoices.GUARDIAN])
-
+class ProxyUserManager(BaseCommonUserManager):
+    """
+    Manager of every User Type proxy model (i.e. Teacher, Student).
+    Only users having the proxy model's user type are returned.
+    The predicate follows `settings.USER_TYPES_LOOKUP`:
+        'gin': `types @> ARRAY[type]`, served by the GIN index on `types`
+        'bitmask': `types_mask & bit = bit` on the denormalized bitmask
+    """
 
-class EmployeeManager(BaseCommonUserManager):
     def get_queryset(self, *args, **kwargs):
-        return super().get_queryset(*args, **kwargs).filter(types__contains=[User.TypesChoices.EMPLOYEE])
+        user_type = self.model.proxy_user_type()
+        queryset = super().get_queryset(*args, **kwargs)
+        if getattr(settings, 'USER_TYPES_LOOKUP', 'gin') == 'bitmask':
+            return queryset.filter(types_mask__has_all=TYPES.mask([user_type]))
+        return queryset.filter(types__contains=[user_type])
 
 
 class AbstractUser(AbstractBaseUser, PermissionsMixin):
@@ -239,8 +343,8 @@ class User(AbstractUser):
     class TypesChoices(models.IntegerChoices):
         """
         This choices for `types` field of User Model.
-        NOTE: Please update `types` field's `size` parameter according to
-              the number of choices.
+        NOTE: Every choice needs its proxy model and <User Type>More model
+              registered in `accounts.registry.user_types`.
         """
         CONTROLLER = 1, _('Controller')
         TEACHER = 2, _('Teacher')
@@ -257,13 +361,17 @@ class User(AbstractUser):
     types = ArrayField(
         models.PositiveSmallIntegerField(
             choices=TypesChoices.choices,
-            # update max_value according to the TypesChoices
-            validators=[MaxValueValidator(5), MinValueValidator(1)],
+            validators=[
+                MaxValueValidator(max(TypesChoices.values)),
+                MinValueValidator(min(TypesChoices.values)),
+            ],
         ),
-        size=5,  # update size whenever new TypesChoices added
+        size=len(TypesChoices),
         default=list,  # default value as an empty list
         blank=True,
     )
+    # bitmask of `types`, kept in sync by save()
+    types_mask = TypesMaskField(default=0, editable=False)
 
     phone = PhoneNumberField(null=True, blank=True, unique=True)
 
@@ -274,8 +382,9 @@ class User(AbstractUser):
                            choices=SexChoices.choices, default=SexChoices.PRIVATE)
 
 
-    avatar_height_field = models.PositiveSmallIntegerField()
-    avatar_width_field = models.PositiveSmallIntegerField()
+    # filled in by the background avatar processing (accounts.images)
+    avatar_height_field = models.PositiveSmallIntegerField(null=True, blank=True)
+    avatar_width_field = models.PositiveSmallIntegerField(null=True, blank=True)
 
     modified = models.DateTimeField(auto_now=True, auto_now_add=False)
 
@@ -286,37 +395,87 @@ class User(AbstractUser):
     # this field will check whether user is verified
     # that means at least phone or email verified at current situation
     is_account_verified = models.BooleanField(default=False)
+    # no height_field/width_field: they would decode the upload in the request,
+    # accounts.images processes it in the background instead
+    # content addressed names (core.storage) in the sharded or pending
+    # FileUploadTo folders are longer than the default 100 characters
     avatar = models.ImageField(
-        default='accounts/user/avatar/default.png',
+        max_length=255,
+        default=DEFAULT_AVATAR,
         upload_to=FileUploadTo(folder_name='avatar', plus_id=True),
-        height_field='avatar_height_field',
-        width_field='avatar_width_field',
+        storage=media_storage,
         blank=True
     )
+    # username, names, email and phone for full-text search (accounts.search),
+    # maintained by a database trigger, see migration 0010_user_search
+    search_vector = SearchVectorField(null=True, editable=False)
     # to track changes in model fields
-    tracker = FieldTracker(fields=['types', 'phone', 'email', 'username'])
+    tracker = FieldTracker(fields=['types', 'phone', 'email', 'username', 'avatar'])
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # serves `types__contains` lookups of the proxy managers
+            GinIndex(fields=['types'], name='accounts_user_types_gin'),
+            GinIndex(fields=['search_vector'], name='accounts_user_search_gin'),
+            # pg_trgm: substring (icontains) and similarity lookups of accounts.search
+            GinIndex(fields=['username'], opclasses=['gin_trgm_ops'], name='accounts_user_username_trgm'),
+            GinIndex(fields=['email'], opclasses=['gin_trgm_ops'], name='accounts_user_email_trgm'),
+            GinIndex(fields=['first_name'], opclasses=['gin_trgm_ops'], name='accounts_user_first_trgm'),
+            GinIndex(fields=['last_name'], opclasses=['gin_trgm_ops'], name='accounts_user_last_trgm'),
+            GinIndex(fields=['phone'], opclasses=['gin_trgm_ops'], name='accounts_user_phone_trgm'),
+        ]
 
     @classmethod
     def proxy_user_type(cls):
-        # Every proxy model must have this proxy_user_type method
-        # which will return TypesChoices corresponding to the proxy model
-        # User model is not a proxy model
-        # so return None
-        return None
+        # return TypesChoices registered for the proxy model
+        # it will be used in many place to maintain some constraints
+        # User model is not a registered proxy model so return None
+        user_type = user_types.for_proxy(cls)
+        return user_type.value if user_type else None
+
+    @property
+    def more(self):
+        # <User Type>More object of the proxy model, i.e. Teacher().more is TeacherMore
+        user_type = user_types.for_proxy(self.__class__)
+        if user_type is None:
+            raise AttributeError(
+                "'%s' is not a registered user type proxy model." % self.__class__.__name__)
+        return user_type.get_more(self)
+
+    def avatar_variant_url(self, variant='sm'):
+        """
+        URL of a resized avatar variant (see settings.AVATAR_THUMBNAIL_SIZES),
+        the original until the background processing has written the variants.
+        """
+        if self.avatar.name == DEFAULT_AVATAR or self.avatar_width_field is None:
+            return self.avatar.url
+        return self.avatar.storage.url(variant_name(self.avatar.name, variant))
+
+    @property
+    def avatar_thumbnail_url(self):
+        return self.avatar_variant_url('sm')
 
     def clean(self):
         super().clean()
-        self.types = self.__class__.objects.normalize_types(self.types)
+        self.types_mask = TYPES.mask(self.types)
+        self.types = list(TYPES.for_mask(self.types_mask))
 
     def save(self, *args, **kwargs):
         # normalize types before calling super().save()
         # otherwise post_save signal will be called before normalize types
-        self.types = self.__class__.objects.normalize_types(
-            self.types,
-            proxy_user_type=self.__class__.proxy_user_type()
-        )
+        self.types_mask = TYPES.mask(self.types, self.__class__.proxy_user_type())
+        self.types = list(TYPES.for_mask(self.types_mask))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'types' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'types_mask'}
         super().save(*args, **kwargs)
 
+
+# canonical `types` (sorted valid values and bitmask), computed once for
+# User.save()/clean(), the managers and bulk operations
+TYPES = TypesNormalizer(User.TypesChoices)
+
+
 class Address(models.Model):
     address_line_1 = models.CharField(max_length=255, blank=True, null=True)
     address_line_2 = models.CharField(max_length=255, blank=True, null=True)
@@ -325,7 +484,7 @@ class Address(models.Model):
     state = models.CharField(max_length=255, blank=True, null=True)
     country = models.CharField(max_length=255, blank=True, null=True)
     geolocation = models.DecimalField(max_digits=9, decimal_places=6)
-    history = HistoricalRecords()
+    history = TrackedHistoricalRecords()
     icon_name = 'place'
 
     def __str__(self):
@@ -347,7 +506,7 @@ class Education(models.Model):
     end_year = models.IntegerField(
         _('end year'), choices=YEAR_CHOICES, default=datetime.datetime.now().year)
     description = models.CharField(max_length=255, blank=True, null=True)
-    history = HistoricalRecords()
+    history = TrackedHistoricalRecords()
 
     def __str__(self):
         return self.degree
@@ -359,24 +518,15 @@ class ControllerMore(TimeStampedModel):
     designation = models.CharField(max_length=100, null=True, blank=True)
     
     is_active = models.BooleanField(default=True)
-    history = HistoricalRecords()
+    history = TrackedHistoricalRecords()
 
     def __str__(self):
         return self.user.username + "-controller & userid is: " + str(self.user.id)
 
 
+@user_types.register(User.TypesChoices.CONTROLLER, ControllerMore)
 class Controller(User):
-    objects = ControllerManager()
-
-    @classmethod
-    def proxy_user_type(cls):
-        # return corresponding choice (User.TypesChoices instance)
-        # it will be used in many place to maintain some constraints
-        return User.TypesChoices.CONTROLLER
-
-    @property
-    def more(self):
-        return self.controllermore
+    objects = ProxyUserManager()
 
     class Meta:
         proxy = True
@@ -395,24 +545,15 @@ class TeacherMore(TimeStampedModel):
     resume = models.FileField(upload_to=user_directory_path, default=None)
 
     is_active = models.BooleanField(default=True)
-    history = HistoricalRecords()
+    history = TrackedHistoricalRecords()
 
     def __str__(self):
         return self.user.username + "-teacher & userid is: " + str(self.user.id)
 
 
+@user_types.register(User.TypesChoices.TEACHER, TeacherMore)
 class Teacher(User):
-    objects = TeacherManager()
-
-    @classmethod
-    def proxy_user_type(cls):
-        # return corresponding choice (User.TypesChoices instance)
-        # it will be used in many place to maintain some constraints
-        return User.TypesChoices.TEACHER
-
-    @property
-    def more(self):
-        return self.teachermore
+    objects = ProxyUserManager()
 
     class Meta:
         proxy = True
@@ -431,23 +572,14 @@ class StudentMore(TimeStampedModel):
     guardian = models.CharField(max_length=50, blank=True, null=True)
     guardian_raltionship = models.CharField(max_length=50, blank=True, null=True)
     is_active = models.BooleanField(default=True)
-    history = HistoricalRecords()
+    history = TrackedHistoricalRecords()
 
     def __str__(self):
         return self.user.username + "-student & userid is: " + str(self.user.id)
 
+@user_types.register(User.TypesChoices.STUDENT, StudentMore)
 class Student(User):
-    objects = StudentManager()
-
-    @classmethod
-    def proxy_user_type(cls):
-        # return corresponding choice (User.TypesChoices instance)
-        # it will be used in many place to maintain some constraints
-        return User.TypesChoices.STUDENT
-
-    @property
-    def more(self):
-        return self.studentmore
+    objects = ProxyUserManager()
 
     class Meta:
         proxy = True
@@ -461,23 +593,14 @@ class GuardianMore(TimeStampedModel):
 
     #common for all models
     is_active = models.BooleanField(default=True)
-    history = HistoricalRecords()
+    history = TrackedHistoricalRecords()
 
     def __str__(self):
         return self.user.username + "-guardian & userid is: " + str(self.user.id)
 
+@user_types.register(User.TypesChoices.GUARDIAN, GuardianMore)
 class Guardian(User):
-    objects = GuardianManager()
-
-    @classmethod
-    def proxy_user_type(cls):
-        # return corresponding choice (User.TypesChoices instance)
-        # it will be used in many place to maintain some constraints
-        return User.TypesChoices.GUARDIAN
-
-    @property
-    def more(self):
-        return self.guardianmore
+    objects = ProxyUserManager()
 
     class Meta:
         proxy = True
@@ -488,24 +611,15 @@ class EmployeeMore(TimeStampedModel):
         User, related_name='employeemore', on_delete=models.CASCADE)
     designation = models.CharField(max_length=100, null=True, blank=True)
     is_active = models.BooleanField(default=True)
-    history = HistoricalRecords()
+    history = TrackedHistoricalRecords()
 
     def __str__(self):
         return self.user.username + "-employee & userid is: " + str(self.user.id)
 
 
+@user_types.register(User.TypesChoices.EMPLOYEE, EmployeeMore)
 class Employee(User):
-    objects = EmployeeManager()
-
-    @classmethod
-    def proxy_user_type(cls):
-        # return corresponding choice (User.TypesChoices instance)
-        # it will be used in many place to maintain some constraints
-        return User.TypesChoices.EMPLOYEE
-
-    @property
-    def more(self):
-        return self.employeemore
+    objects = ProxyUserManager()
 
     class Meta:
         proxy = True
@@ -546,7 +660,7 @@ class Profile(models.Model):
     contact_emails = ArrayField(models.CharField(
         max_length=200), blank=True, null=True)
 
-    history = HistoricalRecords()
+    history = TrackedHistoricalRecords()
 
 
 
@@ -567,139 +681,54 @@ class Profile(models.Model):
         return True
     
 
-# update this when you update User.TypesChoices
-# so corresponding User Type's More Object create properly
-@receiver(post_save, sender=User)
-@receiver(post_save, sender=Controller)
-@receiver(post_save, sender=Teacher)
-@receiver(post_save, sender=Student)
-@receiver(post_save, sender=Guardian)
-@receiver(post_save, sender=Employee)
 def post_save_user_types_handler(sender, instance, created, *args, **kwargs):
     """
-    post_save handler of User model.
+    post_save handler of User model and every registered proxy model.
     """
-    print("inside post_save")
     if created and instance:
         # user has been created
         # create Profile of User
         try:
             _ = Profile.objects.create(user=instance)
-        except Exception as e:
-            print(e)
+        except Exception:
+            logger.warning('profile of user %s not created', instance.pk, exc_info=True)
 
         # create corresponding `types` related models (i.e. TeacherMore, StudentMore) if needed
         if instance.types and len(instance.types) > 0:
-            print(f"instance.types (created)={instance.types}")
-            from accounts.models import (ControllerMore, EmployeeMore,
-                                         GuardianMore, StudentMore,
-                                         TeacherMore, User)
-            if User.TypesChoices.CONTROLLER in instance.types:
-                # create ControllerMore
-                _ = ControllerMore.objects.create(user=instance)
-            if User.TypesChoices.TEACHER in instance.types:
-                # create TeacherMore
-                _ = TeacherMore.objects.create(user=instance)
-            if User.TypesChoices.STUDENT in instance.types:
-                # create StudentMore
-                _ = StudentMore.objects.create(user=instance)
-            if User.TypesChoices.GUARDIAN in instance.types:
-                # create GuardianMore
-                _ = GuardianMore.objects.create(user=instance)
-            if User.TypesChoices.EMPLOYEE in instance.types:
-                # create EmployeeMore
-                _ = EmployeeMore.objects.create(user=instance)
+            log_event(logger, logging.DEBUG, 'user_created', user_id=instance.pk, types=instance.types)
+            for user_type in instance.types:
+                _ = user_types[user_type].create_more(instance)
 
     elif instance and instance.tracker.has_changed('types'):
-        print(f"instance.types (chnaged)={instance.types}")
-        from accounts.models import (ControllerMore, EmployeeMore,
-                                     GuardianMore, StudentMore, TeacherMore,
-                                     User)
+        log_event(logger, logging.DEBUG, 'user_types_changed', user_id=instance.pk,
+                  previous=instance.tracker.previous('types'), types=instance.types)
+        from accounts.reconcile import reconcile_types
 
         # user types has been changed
-        # create corresponding `types` related models (i.e. TeacherMore, StudentMore) if needed
+        # activate, deactivate or create corresponding `types` related models
+        # (i.e. TeacherMore, StudentMore) of added and removed types only
         previous_types_set = set(instance.tracker.previous(
             'types') if instance.tracker.previous('types') else list())
         current_types_set = set(instance.types if instance.types else list())
-        removed_types_set = previous_types_set - current_types_set
-        added_types_set = current_types_set - previous_types_set
-        # print(f"previous_types_set={previous_types_set}, current_types_set={current_types_set}, \
-        #     removed_types_set={removed_types_set}, added_types_set={added_types_set}")
-
-        # create or update (if needed. i.e. change active=True if already exist)
-        # corresponding `types` (added_types_set) related models
-        if len(added_types_set) > 0:
-            print(f"adding added_types_set:{added_types_set}")
-            for user_type in added_types_set:
-                if user_type == User.TypesChoices.CONTROLLER:
-                    # create or update ControllerMore
-                    _ = ControllerMore.objects.update_or_create(
-                        user=instance, is_active=True)
-                elif user_type == User.TypesChoices.TEACHER:
-                    # create or update TeacherMore
-                    _ = TeacherMore.objects.update_or_create(
-                        user=instance, is_active=True)
-                elif user_type == User.TypesChoices.STUDENT:
-                    # create or update StudentMore
-                    _ = StudentMore.objects.update_or_create(
-                        user=instance, is_active=True)
-                elif user_type == User.TypesChoices.GUARDIAN:
-                    # create or update GuardianMore
-                    _ = GuardianMore.objects.update_or_create(
-                        user=instance, is_active=True)
-                elif user_type == User.TypesChoices.EMPLOYEE:
-                    # create or update EmployeeMore
-                    _ = EmployeeMore.objects.update_or_create(
-                        user=instance, is_active=True)
-
-        # update (if exist) corresponding `types` (removed_types_set) related models
-        if len(removed_types_set) > 0:
-            print(f"removing removed_types_set:{removed_types_set}")
-            for user_type in removed_types_set:
-                if user_type == User.TypesChoices.CONTROLLER:
-                    try:
-                        # check obj of user_type exist
-                        obj = ControllerMore.objects.get(user=instance)
-                        # do something of this obj if needed, i.e. update active=False
-                        obj.is_active = False
-                        obj.save()
-                    except ControllerMore.DoesNotExist:
-                        pass
-                elif user_type == User.TypesChoices.TEACHER:
-                    try:
-                        # check obj of user_type exist
-                        obj = TeacherMore.objects.get(user=instance)
-                        # do something of this obj if needed, i.e. update active=False
-                        obj.is_active = False
-                        obj.save()
-                    except TeacherMore.DoesNotExist:
-                        pass
-                elif user_type == User.TypesChoices.STUDENT:
-                    try:
-                        # check obj of user_type exist
-                        obj = StudentMore.objects.get(user=instance)
-                        # do something of this obj if needed, i.e. update active=False
-                        obj.is_active = False
-                        obj.save()
-                    except StudentMore.DoesNotExist:
-                        pass
-                elif user_type == User.TypesChoices.GUARDIAN:
-                    try:
-                        # check obj of user_type exist
-                        obj = GuardianMore.objects.get(user=instance)
-                        # do something of this obj if needed, i.e. update active=False
-                        obj.is_active = False
-                        obj.save()
-                    except GuardianMore.DoesNotExist:
-                        pass
-                elif user_type == User.TypesChoices.EMPLOYEE:
-                    try:
-                        # check obj of user_type exist
-                        obj = EmployeeMore.objects.get(user=instance)
-                        # do something of this obj if needed, i.e. update active=False
-                        obj.is_active = False
-                        obj.save()
-                    except EmployeeMore.DoesNotExist:
-                        pass
+        reconcile_types(
+            [(instance.pk, instance.types)],
+            only_types=previous_types_set ^ current_types_set,
+        )
+
+
+user_types.connect(post_save, post_save_user_types_handler, User,
+                   dispatch_uid='post_save_user_types_handler')
+
+
+def post_save_user_avatar_handler(sender, instance, created, *args, **kwargs):
+    """
+    Hand a new avatar over to the background processing once committed.
+    """
+    if created or instance.tracker.has_changed('avatar'):
+        user_id, name = instance.pk, instance.avatar.name
+        if name and name != DEFAULT_AVATAR:
+            transaction.on_commit(lambda: enqueue_avatar(user_id, name))
 
 
+user_types.connect(post_save, post_save_user_avatar_handler, User,
+                   dispatch_uid='post_save_user_avatar_handler')
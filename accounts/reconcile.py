@@ -0,0 +1,68 @@
+# accounts.reconcile.py
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history
+
+from accounts.registry import user_types
+from core.history import current_history_user
+
+
+def reconcile_types(rows, only_types=None):
+    '''
+    RECONCILE <User Type>More ROWS
+    Bring every <User Type>More table in line with the users' current `types`:
+    a row is active when its type is in `types`, inactive otherwise, and
+    missing rows are created for newly added types.
+    Every table costs at most one SELECT, one UPDATE per direction and one
+    bulk INSERT, whatever the number of users.
+        [rows]: iterable of (user_id, types) pairs (e.g. values_list('id', 'types'))
+        [only_types]: restrict the work to these types (i.e. the changed ones)
+    '''
+    having = defaultdict(set)
+    user_ids = set()
+    for user_id, types in rows:
+        user_ids.add(user_id)
+        for user_type in types or ():
+            having[user_type].add(user_id)
+    if not user_ids:
+        return
+
+    if only_types is None:
+        only_types = [user_type.value for user_type in user_types]
+    with transaction.atomic():
+        for value in only_types:
+            _reconcile_model(
+                user_types[value].more_model, user_ids, having[value])
+
+
+def _reconcile_model(more_model, user_ids, having_ids):
+    existing = list(more_model.objects.filter(user_id__in=user_ids))
+    existing_user_ids = set()
+    to_activate, to_deactivate = [], []
+    for obj in existing:
+        existing_user_ids.add(obj.user_id)
+        if obj.user_id in having_ids and not obj.is_active:
+            to_activate.append(obj)
+        elif obj.user_id not in having_ids and obj.is_active:
+            to_deactivate.append(obj)
+
+    for objs, is_active in ((to_activate, True), (to_deactivate, False)):
+        if not objs:
+            continue
+        now = timezone.now()
+        more_model.objects.filter(pk__in=[obj.pk for obj in objs]).update(
+            is_active=is_active, modified=now)
+        for obj in objs:
+            obj.is_active = is_active
+            obj.modified = now
+        # queryset update() skips simple_history, so record the change here
+        more_model.history.bulk_history_create(
+            objs, update=True, default_user=current_history_user())
+
+    missing = [more_model(user_id=user_id)
+               for user_id in having_ids - existing_user_ids]
+    if missing:
+        bulk_create_with_history(
+            missing, more_model, ignore_conflicts=True, default_user=current_history_user())
@@ -0,0 +1,139 @@
+# accounts.registry.py
+
+
+class UserType:
+    '''
+    A registered user type: the `User.TypesChoices` value, its proxy model
+    (i.e. Teacher) and its <User Type>More model (i.e. TeacherMore).
+    '''
+
+    def __init__(self, value, proxy_model, more_model):
+        self.value = value
+        self.proxy_model = proxy_model
+        self.more_model = more_model
+        # reverse OneToOne accessor on User, i.e. 'teachermore'
+        self.more_name = more_model._meta.get_field(
+            'user').remote_field.get_accessor_name()
+
+    def __repr__(self):
+        return '<UserType %s: %s>' % (self.value, self.proxy_model.__name__)
+
+    def get_more(self, user):
+        return getattr(user, self.more_name)
+
+    def create_more(self, user):
+        return self.more_model.objects.create(user=user)
+
+
+class UserTypeRegistry:
+    '''
+    UserTypeRegistry()
+    Single place where every user type is declared. Lookups are dict based,
+    so dispatching on a type value or on a proxy model is O(1).
+
+        @user_types.register(User.TypesChoices.TEACHER, TeacherMore)
+        class Teacher(User):
+            objects = ProxyUserManager()
+
+            class Meta:
+                proxy = True
+    '''
+
+    def __init__(self):
+        self._by_value = {}
+        self._by_proxy = {}
+
+    def register(self, value, more_model):
+        def decorator(proxy_model):
+            if value in self._by_value:
+                raise ValueError('User type %r is already registered.' % value)
+            user_type = UserType(value, proxy_model, more_model)
+            self._by_value[value] = user_type
+            self._by_proxy[proxy_model] = user_type
+            return proxy_model
+        return decorator
+
+    def __getitem__(self, value):
+        return self._by_value[value]
+
+    def __contains__(self, value):
+        return value in self._by_value
+
+    def __iter__(self):
+        return iter(self._by_value.values())
+
+    def __len__(self):
+        return len(self._by_value)
+
+    def get(self, value, default=None):
+        return self._by_value.get(value, default)
+
+    def for_proxy(self, proxy_model):
+        return self._by_proxy.get(proxy_model)
+
+    def connect(self, signal, receiver, base_model, dispatch_uid):
+        '''
+        Connect `receiver` to `signal` for `base_model` and every registered proxy model.
+        Proxy models send signals with themselves as sender.
+        '''
+        senders = [base_model] + [t.proxy_model for t in self]
+        for sender in senders:
+            signal.connect(
+                receiver, sender=sender, weak=False,
+                dispatch_uid='%s.%s' % (dispatch_uid, sender.__name__),
+            )
+
+
+user_types = UserTypeRegistry()
+
+
+def types_mask(types):
+    '''
+    Bitmask of a `types` list: bit `1 << value` is set for every user type.
+    It is stored denormalized in `User.types_mask`.
+    '''
+    mask = 0
+    for value in types or ():
+        mask |= 1 << value
+    return mask
+
+
+class TypesNormalizer:
+    '''
+    TypesNormalizer(User.TypesChoices)
+    Canonical form of a `types` value: its bitmask, and the sorted tuple of
+    the valid types it holds. The valid types, their bits and the tuple of
+    every possible mask are computed once, so normalizing allocates nothing
+    but the result.
+        TYPES.mask([3, 1, 1, 9]) -> 0b1010
+        TYPES.for_mask(0b1010) -> (1, 3)
+    '''
+
+    def __init__(self, choices):
+        self.valid = frozenset(int(value) for value in choices.values)
+        self.bits = {value: 1 << value for value in self.valid}
+        ordered = sorted(self.valid)
+        self.tuples = {}
+        for subset in range(1 << len(ordered)):
+            values = tuple(value for index, value in enumerate(ordered) if subset >> index & 1)
+            self.tuples[types_mask(values)] = values
+
+    def mask(self, types, proxy_user_type=None):
+        '''
+        Bitmask of the valid values of `types` (any iterable of ints or
+        TypesChoices), plus `proxy_user_type` when given. Invalid values are dropped.
+        '''
+        bits = self.bits
+        mask = bits.get(proxy_user_type, 0) if proxy_user_type is not None else 0
+        if isinstance(types, int):
+            # a single type
+            return mask | bits.get(types, 0)
+        for value in types or ():
+            mask |= bits.get(value, 0)
+        return mask
+
+    def for_mask(self, mask):
+        return self.tuples[mask]
+
+    def normalize(self, types, proxy_user_type=None):
+        return self.tuples[self.mask(types, proxy_user_type)]
@@ -0,0 +1,117 @@
+# accounts.search.py
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db.models import CharField, F, Q
+from django.db.models.functions import Greatest
+from django.db.models.lookups import IContains
+
+# tsquery operators and quotes are dropped from search terms
+TERM_RE = re.compile(r"[^\s&|!():*'\\<>]+")
+# shorter terms can't use the pg_trgm indexes
+TRIGRAM_MIN_LENGTH = 3
+AUTOCOMPLETE_LIMIT = 10
+
+
+@CharField.register_lookup
+class TrigramContains(IContains):
+    '''
+    `field__trigram_contains=text`: `field ILIKE '%text%'` on the bare column,
+    which its gin_trgm_ops index serves. `icontains` compiles to
+    `UPPER(field::text) LIKE UPPER(...)`, which no column index serves.
+    '''
+    lookup_name = 'trigram_contains'
+
+    def as_sql(self, compiler, connection):
+        lhs_sql, params = self.process_lhs(compiler, connection)
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        return '%s ILIKE %s' % (lhs_sql, rhs_sql), params + rhs_params
+
+
+def search_terms(query):
+    return TERM_RE.findall(query or '')
+
+
+def prefix_query(terms):
+    '''
+    tsquery matching every term as a word prefix, `ann sm` -> `ann:* & sm:*`.
+    '''
+    return SearchQuery(
+        ' & '.join("'%s':*" % term for term in terms),
+        config='simple', search_type='raw',
+    )
+
+
+def search_users(query, queryset=None, limit=AUTOCOMPLETE_LIMIT):
+    '''
+    Users matching `query` on username, first/last name, email and phone:
+        - word prefixes on the trigger maintained `search_vector` (GIN index)
+        - substrings (ILIKE) of username, email, names and phone, and
+          similar (`%` operator, i.e. typos) usernames and names, both served
+          by the pg_trgm column indexes, for terms of 3 characters or more
+    Best matches first (trigram similarity, then full-text rank), at most
+    `limit` of them; `limit=None` returns the unordered filtered queryset
+    (i.e. for the admin changelist, which orders itself).
+    '''
+    from accounts.models import User
+
+    if queryset is None:
+        queryset = User.objects.all()
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+    text = ' '.join(terms)
+    tsquery = prefix_query(terms)
+
+    condition = Q(search_vector=tsquery)
+    if len(text) >= TRIGRAM_MIN_LENGTH:
+        condition |= (
+            Q(username__trigram_contains=text) | Q(email__trigram_contains=text)
+            | Q(first_name__trigram_contains=text) | Q(last_name__trigram_contains=text)
+            | Q(phone__trigram_contains=text)
+            | Q(username__trigram_similar=text)
+            | Q(first_name__trigram_similar=text) | Q(last_name__trigram_similar=text)
+        )
+    queryset = queryset.filter(condition)
+    if limit is None:
+        return queryset
+    return queryset.annotate(
+        similarity=Greatest(
+            TrigramSimilarity('username', text),
+            TrigramSimilarity('email', text),
+            TrigramSimilarity('first_name', text),
+            TrigramSimilarity('last_name', text),
+        ),
+        rank=SearchRank(F('search_vector'), tsquery),
+    ).order_by('-similarity', '-rank', 'username')[:limit]
+
+
+def autocomplete_results(users):
+    '''
+    No email or phone: suggestions are shown to other users.
+    '''
+    return [
+        {
+            'id': user.pk,
+            'username': user.username,
+            'name': user.get_full_name(),
+        }
+        for user in users
+    ]
+
+
+class UserSearchMixin:
+    '''
+    ModelAdmin mixin searching through accounts.search.search_users.
+    `user_search_path` is the lookup from the admin's model to User
+    ('' for User itself, 'user' for Profile and the <User Type>More models).
+    '''
+    user_search_path = ''
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        if not self.user_search_path:
+            return search_users(search_term, queryset, limit=None), False
+        users = search_users(search_term, limit=None).values('pk')
+        return queryset.filter(**{'%s__in' % self.user_search_path: users}), False
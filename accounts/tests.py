@@ -1,3 +1,328 @@
-from django.test import TestCase
+import datetime
+import os
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import Permission
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from simple_history.models import HistoricalRecords
+from simple_history.signals import post_create_historical_record, pre_create_historical_record
+
+from accounts.backends import CachedModelBackend
+from accounts.images import process_avatar, variant_name
+from accounts.models import Address, Education, Profile, TeacherMore, User
+from accounts.search import search_users
+from core.history import buffered_history, retention_days
+from core.testing import QueryBudgetTestCase
+from institude.models import Institude, InstituteGroups, InstituteMembership, InstituteRole, PaymentStatus
+
+
+class AdminChangelistQueryTests(QueryBudgetTestCase):
+    '''
+    Changelist pages run the same queries whatever the number of rows.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.added = 0
+
+    def add_teachers(self, count=3):
+        # Profile and TeacherMore are created by the post_save handler,
+        # the institute's groups by Institude.save()
+        for _ in range(count):
+            self.added += 1
+            user = User.objects.create_user(
+                'teacher%s' % self.added, 'teacher%s@example.com' % self.added, 'pass',
+                types=[User.TypesChoices.TEACHER])
+            PaymentStatus.objects.create(user=user, amount=0)
+            institute = Institude.objects.create(
+                owner=user, name='institute%s' % self.added, category='College',
+                contact_phones='0', contact_emails='school@example.com',
+                contact_others='-', description='-', established_date=datetime.date(2000, 1, 1))
+            institute.role_group(InstituteRole.TEACHERS).user_set.add(user)
+
+    def assertChangelistConstant(self, model):
+        url = reverse('admin:%s_%s_changelist' % (model._meta.app_label, model._meta.model_name))
+
+        def get_changelist():
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+        self.add_teachers()
+        # fills the cached sidebar counts (core.counts), reused by the next pages
+        get_changelist()
+        self.assertConstantQueries(get_changelist, self.add_teachers)
+
+    def test_user_related_changelists(self):
+        for model in (TeacherMore, Profile):
+            with self.subTest(model=model.__name__):
+                self.assertChangelistConstant(model)
+
+    def test_autoregistered_changelists(self):
+        # list_display and list_select_related derived by core.autoadmin,
+        # InstituteGroups.__str__ reads its institute
+        for model in (PaymentStatus, InstituteGroups, InstituteMembership):
+            with self.subTest(model=model.__name__):
+                self.assertChangelistConstant(model)
+
+
+@override_settings(PERMISSIONS_CACHE='default')
+class CachedModelBackendTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('perms', 'perms@example.com', 'pass')
+        self.backend = CachedModelBackend()
+
+    def permissions(self):
+        # a new request's user
+        return self.backend.get_all_permissions(User.objects.get(pk=self.user.pk))
+
+    def test_is_superuser_change(self):
+        self.assertEqual(self.permissions(), set())
+        User.objects.filter(pk=self.user.pk).update(is_superuser=True)
+        self.assertIn('accounts.change_user', self.permissions())
+        self.user.is_superuser = False
+        self.user.save()
+        self.assertEqual(self.permissions(), set())
+
+    def test_is_active_change(self):
+        self.user.user_permissions.add(Permission.objects.get(codename='change_user'))
+        self.assertEqual(self.permissions(), {'accounts.change_user'})
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.permissions(), set())
+
+
+class BulkUpdateTypesTests(TransactionTestCase):
+
+    def test_concurrent_update_is_not_lost(self):
+        user = User.objects.create_user('types', 'types@example.com', 'pass')
+
+        def add_student():
+            try:
+                User.objects.bulk_update_types([user], add=[User.TypesChoices.STUDENT])
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            User.objects.select_for_update().get(pk=user.pk)
+            thread = threading.Thread(target=add_student)
+            thread.start()
+            # let it wait on the lock
+            time.sleep(0.5)
+            User.objects.bulk_update_types([user], add=[User.TypesChoices.TEACHER])
+        thread.join()
+        user.refresh_from_db()
+        self.assertEqual(user.types, [User.TypesChoices.TEACHER, User.TypesChoices.STUDENT])
+
+class SearchUsersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.anna = User.objects.create_user(
+            'anna_s', 'anna@example.com', 'pass', first_name='Anna', last_name='Hossain')
+        cls.john = User.objects.create_user(
+            'johnny', 'john@example.org', 'pass', first_name='John', last_name='Miller')
+
+    def search(self, query):
+        return list(search_users(query))
+
+    def test_prefix_substring_and_typo(self):
+        self.assertEqual(self.search('ann'), [self.anna])
+        self.assertEqual(self.search('EXAMPLE.ORG'), [self.john])
+        # not a substring of any column, similar to the last name
+        self.assertEqual(self.search('hosain'), [self.anna])
+        self.assertEqual(self.search('nobody'), [])
+
+    def test_like_wildcards_are_literal(self):
+        self.assertEqual(self.search('a%n'), [])
+
+    def test_lookups_served_by_trigram_indexes(self):
+        queryset = search_users('hossain', limit=None)
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        for index in ('accounts_user_username_trgm', 'accounts_user_email_trgm',
+                      'accounts_user_first_trgm', 'accounts_user_last_trgm', 'accounts_user_phone_trgm'):
+            self.assertIn(index, plan)
+
+
+class TrackedHistoryTests(TestCase):
+
+    def setUp(self):
+        self.address = Address.objects.create(city='Dhaka', geolocation=1)
+
+    def history(self):
+        return list(self.address.history.order_by('history_date').values_list('history_type', 'city'))
+
+    def test_unchanged_save_writes_no_history(self):
+        self.address.save()
+        Address.objects.get(pk=self.address.pk).save()
+        self.address.city = 'Sylhet'
+        self.address.save()
+        self.assertEqual(self.history(), [('+', 'Dhaka'), ('~', 'Sylhet')])
+
+    def test_change_behind_a_stale_instance(self):
+        other = Address.objects.get(pk=self.address.pk)
+        other.city = 'Sylhet'
+        other.save()
+        # loaded as Dhaka, still Dhaka: the history row tells the table changed
+        self.address.save()
+        self.assertEqual(self.history(), [('+', 'Dhaka'), ('~', 'Sylhet'), ('~', 'Dhaka')])
+
+    def test_change_back_after_refresh_from_db(self):
+        other = Address.objects.get(pk=self.address.pk)
+        other.city = 'Sylhet'
+        other.save()
+        self.address.refresh_from_db()
+        self.address.city = 'Dhaka'
+        self.address.save()
+        self.assertEqual(self.history(), [('+', 'Dhaka'), ('~', 'Sylhet'), ('~', 'Dhaka')])
+
+    def test_queryset_update_with_history(self):
+        Address.objects.filter(pk=self.address.pk).update(city='Sylhet')
+        Address.history.bulk_history_create([Address.objects.get(pk=self.address.pk)], update=True)
+        self.address.save()
+        self.assertEqual(self.history(), [('+', 'Dhaka'), ('~', 'Sylhet'), ('~', 'Dhaka')])
+
+
+class BufferedHistoryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('editor', 'editor@example.com', 'pass')
+        request = RequestFactory().get('/')
+        request.user = self.user
+        # as set by HistoryRequestMiddleware
+        HistoricalRecords.context.request = request
+        self.addCleanup(delattr, HistoricalRecords.context, 'request')
+
+    def history_inserts(self, context):
+        table = Address.history.model._meta.db_table
+        return [query for query in context.captured_queries if query['sql'].startswith('INSERT INTO "%s"' % table)]
+
+    def test_one_insert_per_block(self):
+        with CaptureQueriesContext(connection) as context, buffered_history():
+            addresses = [Address.objects.create(city='city%s' % number, geolocation=1) for number in range(3)]
+            with buffered_history():
+                addresses[0].city = 'changed'
+                addresses[0].save()
+                # unchanged, as the buffered row shows
+                addresses[1].save()
+            self.assertFalse(Address.history.exists())
+        self.assertEqual(len(self.history_inserts(context)), 1)
+        self.assertEqual(
+            sorted(Address.history.values_list('history_type', 'city', 'history_user')),
+            [('+', 'city0', self.user.pk), ('+', 'city1', self.user.pk),
+             ('+', 'city2', self.user.pk), ('~', 'changed', self.user.pk)])
+
+    def test_signals(self):
+        sent = []
+
+        def receiver(signal, **kwargs):
+            sent.append((signal, kwargs['instance'].city, kwargs['history_instance'].pk, kwargs['history_user']))
+
+        for signal in (pre_create_historical_record, post_create_historical_record):
+            signal.connect(receiver, sender=Address.history.model)
+            self.addCleanup(signal.disconnect, receiver, sender=Address.history.model)
+        with buffered_history():
+            address = Address.objects.create(city='Dhaka', geolocation=1)
+        row = address.history.get()
+        self.assertEqual(sent, [
+            (pre_create_historical_record, 'Dhaka', None, self.user),
+            (post_create_historical_record, 'Dhaka', row.pk, self.user),
+        ])
+
+    def test_rolled_back_with_the_block(self):
+        with self.assertRaises(ValueError), buffered_history():
+            Address.objects.create(city='Dhaka', geolocation=1)
+            raise ValueError
+        self.assertFalse(Address.objects.exists())
+        self.assertFalse(Address.history.exists())
+
+
+class PruneHistoryTests(TestCase):
+
+    def setUp(self):
+        self.address = Address.objects.create(city='Dhaka', geolocation=1)
+        for city in ('Sylhet', 'Khulna'):
+            self.address.city = city
+            self.address.save()
+        self.other = Address.objects.create(city='Rajshahi', geolocation=1)
+        old = timezone.now() - datetime.timedelta(days=100)
+        Address.history.update(history_date=old)
+        Address.history.filter(city='Khulna').update(history_date=old + datetime.timedelta(days=1))
+
+    def prune(self, *args):
+        call_command('prune_history', 'accounts.Address', '--days', '30', *args, stdout=StringIO())
+        return sorted(Address.history.values_list('city', flat=True))
+
+    @override_settings(HISTORY_RETENTION_DAYS={'accounts.Address': 30, '*': 365})
+    def test_retention_days(self):
+        self.assertEqual(retention_days(Address), 30)
+        self.assertEqual(retention_days(Education), 365)
+        with self.settings(HISTORY_RETENTION_DAYS={}):
+            self.assertIsNone(retention_days(Address))
+
+    def test_prune_in_chunks(self):
+        self.assertEqual(self.prune('--chunk-size', '1'), [])
+
+    def test_keep_latest(self):
+        self.assertEqual(self.prune('--chunk-size', '2', '--keep-latest'), ['Khulna', 'Rajshahi'])
+
+    def test_dry_run(self):
+        out = StringIO()
+        call_command('prune_history', 'accounts.Address', '--days', '30', '--dry-run', stdout=out)
+        self.assertIn('4 rows to delete', out.getvalue())
+        self.assertEqual(Address.history.count(), 4)
+
+
+class ProcessAvatarTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name, AVATAR_THUMBNAIL_SIZES={'sm': 8})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        buffer = BytesIO()
+        Image.new('RGB', (32, 16), 'red').save(buffer, format='PNG')
+        # no id yet: uploaded to the pending folder
+        self.user = User(username='pic', email='pic@example.com')
+        self.user.avatar = SimpleUploadedFile('photo.png', buffer.getvalue())
+        self.user.save()
+        self.storage = self.user.avatar.storage
+        self.uploaded = self.user.avatar.name
+
+    def test_replaced_once_written(self):
+        process_avatar(self.user.pk, self.uploaded)
+        self.user.refresh_from_db()
+        name = self.user.avatar.name
+        self.assertIn('/%s/' % self.user.pk, name)
+        self.assertEqual((self.user.avatar_width_field, self.user.avatar_height_field), (32, 16))
+        self.assertTrue(self.storage.exists(name))
+        self.assertTrue(self.storage.exists(variant_name(name, 'sm')))
+        self.assertFalse(self.storage.exists(self.uploaded))
+
+    def test_avatar_changed_meanwhile(self):
+        User.objects.filter(pk=self.user.pk).update(avatar='accounts/user/avatar/other.png')
+        process_avatar(self.user.pk, self.uploaded)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar.name, 'accounts/user/avatar/other.png')
+        self.assertFalse(self.storage.exists(self.uploaded))
+        # neither the upload nor the files written from it are left
+        root = self.storage.path(self.uploaded.rsplit('/_pending/', 1)[0])
+        self.assertEqual([
+            name for _, _, names in os.walk(root) for name in names if not name.endswith('.refs')
+        ], [])
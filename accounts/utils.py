@@ -1,7 +1,31 @@
 # accounts.utils.py
-import time
 import datetime
-from django.contrib.contenttypes.models import ContentType
+import functools
+import hashlib
+import os
+import time
+
+PENDING_FOLDER = '_pending'
+
+
+@functools.lru_cache(maxsize=None)
+def model_labels(model):
+    '''
+    (app_label, model_name) of the concrete model, like ContentType.objects.get_for_model()
+    but from `_meta` and memoized per class, no database involved.
+    '''
+    opts = model._meta.concrete_model._meta
+    return opts.app_label, opts.model_name
+
+
+def shard(key, depth=1):
+    '''
+    Hash prefix directories for `key`, i.e. shard('42') -> 'a1'.
+    256 buckets per level keep every directory small.
+    '''
+    digest = hashlib.md5(str(key).encode()).hexdigest()
+    return '/'.join(digest[2 * i:2 * i + 2] for i in range(depth))
+
 
 class FileUploadTo:
     '''
@@ -15,7 +39,7 @@ class FileUploadTo:
         self.plus_date = plus_date
 
     def __call__(self, instance, filename):
-        ''' 
+        '''
         CALL FileUploadTo
             [instance]: instance is an instance of a dango_model of an django_app
             [filename]: filename is the file name of a file comming from Field of django_model
@@ -24,27 +48,56 @@ class FileUploadTo:
         # return 'documents/{}/{}.pdf'.format(instance.user.rfc, self.name)
         return path
 
+    def new_filename(self, filename):
+        splitlist = filename.split(".")
+        filebase, extension = splitlist[0], splitlist[-1]
+        return f"{ int(time.time() * 1000) }_{filebase}.{extension}"
+
+    def folder(self, model, pk):
+        '''
+        FOLDER
+            PATH: <app_label>/<model>/<folder_name>[/<shard>/<id>][/<Y/m/d>]
+            Without an id yet (plus_id and unsaved instance) the file goes to
+            <app_label>/<model>/<folder_name>/_pending/<shard>, the background
+            avatar processing writes it to finalize_name() (accounts.images).
+        '''
+        app_label, model_name = model_labels(model)
+        folder_name = self.folder_name
+        if self.plus_id:
+            if pk is None:
+                return None
+            folder_name = f'{folder_name}/{shard(pk)}/{pk}'
+        if self.plus_date:
+            # "%Y/%m/%d/%H_%M_%S/"
+            folder_name = f'{folder_name}/{datetime.date.today().strftime("%Y/%m/%d")}'
+        return "%s/%s/%s" % (app_label, model_name, folder_name)
+
     def upload_location(self, instance, filename):
         '''
         UPLOAD LOCATION
         It's generate path according to the given instance.
-            PATH: <app_label>/<model>/<new_generated_filename>.<file_extension>
+            PATH: <app_label>/<model>/<folder_name>/.../<new_generated_filename>.<file_extension>
             Challenge: How can I get the field_name for which this function. In this case 'image' field name given by user. Then automate the upload_location function. [May be this is the solution]
                 Solution: FileUploadTo('field_name')
         '''
-        splitlist = filename.split(".")
-        filebase, extension = splitlist[0], splitlist[-1]
-        new_filename = f"{ int(time.time() * 1000) }_{filebase}.{extension}"
-        content_type = ContentType.objects.get_for_model(instance.__class__)
-        app_label = content_type.app_label
-        model_name = content_type.model
-        folder_name = self.folder_name
-        if self.plus_id and instance.id:
-            folder_name = f'{folder_name}/{instance.id}'
-        if self.plus_date:
-            # "%Y/%m/%d/%H_%M_%S/"
-            folder_name = f'{folder_name}/{datetime.date.today().strftime("%Y/%m/%d")}'
-        return "%s/%s/%s/%s" % (app_label, model_name, folder_name, new_filename)
+        new_filename = self.new_filename(filename)
+        folder = self.folder(instance.__class__, instance.pk)
+        if folder is None:
+            app_label, model_name = model_labels(instance.__class__)
+            folder = "%s/%s/%s/%s/%s" % (
+                app_label, model_name, self.folder_name, PENDING_FOLDER, shard(new_filename, depth=2))
+        return "%s/%s" % (folder, new_filename)
+
+    def is_pending(self, name):
+        return f'/{self.folder_name}/{PENDING_FOLDER}/' in name
+
+    def finalize_name(self, model, pk, name):
+        '''
+        Final name of a pending file once the instance has a primary key.
+        '''
+        if not self.plus_id or pk is None or not self.is_pending(name):
+            return name
+        return "%s/%s" % (self.folder(model, pk), os.path.basename(name))
 
     # need to find out what is the purpose of
     #     ValueError: Cannot serialize: <accounts.utils.FileUploadTo object at 0x0000022264685C88>
@@ -52,4 +105,9 @@ class FileUploadTo:
     # For more, see https://docs.djangoproject.com/en/2.0/topics/migrations/#migration-serializing
 
     def deconstruct(self):
-        return ('accounts.utils.FileUploadTo', [self.folder_name], {})
+        kwargs = {}
+        if self.plus_id:
+            kwargs['plus_id'] = self.plus_id
+        if self.plus_date:
+            kwargs['plus_date'] = self.plus_date
+        return ('accounts.utils.FileUploadTo', [self.folder_name], kwargs)
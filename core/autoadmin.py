@@ -0,0 +1,140 @@
+# core.autoadmin.py
+from django.contrib import admin
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.search import SearchVectorField
+from django.core.paginator import Paginator
+from django.db import models
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from material.admin.sites import MaterialAdminSite
+
+from .counts import cached_count, count_rows
+from .history import buffered_history
+
+# columns of an auto generated changelist, the primary key included
+AUTO_LIST_DISPLAY_MAX = 8
+# big, unreadable in a table cell or not meant to be shown
+SKIPPED_FIELDS = (
+    models.TextField, models.BinaryField, models.JSONField, models.FileField,
+    ArrayField, SearchVectorField,
+)
+SKIPPED_NAMES = ('password',)
+
+
+class EstimatedCountPaginator(Paginator):
+    '''
+    Paginator of unfiltered querysets counting with the planner estimate
+    (core.counts.count_rows) once it reaches ADMIN_ESTIMATED_COUNT_THRESHOLD
+    rows, instead of a COUNT(*) scanning the whole table on every page.
+    Filtered querysets, and smaller tables, are counted exactly.
+    '''
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            return count_rows(self.object_list)
+        return super().count
+
+
+class LeanModelAdmin(admin.ModelAdmin):
+    '''
+    ModelAdmin whose changelist costs a fixed number of queries per page:
+    no second COUNT(*) of the whole table, estimated counts on big tables.
+    Bulk actions write their history rows in bulk (core.history.buffered_history).
+    Set `list_select_related` for the relations `list_display` (or `__str__`) reads.
+    '''
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def response_action(self, request, queryset):
+        # i.e. delete_selected: one history INSERT per model, not per object
+        with buffered_history():
+            return super().response_action(request, queryset)
+
+
+def list_display_for(model):
+    '''
+    The primary key then the first readable concrete fields of `model`
+    (foreign keys included), at most AUTO_LIST_DISPLAY_MAX of them.
+    '''
+    opts = model._meta
+    fields = [opts.pk.name]
+    for field in opts.concrete_fields:
+        if len(fields) >= AUTO_LIST_DISPLAY_MAX:
+            break
+        if field.primary_key or field.name in SKIPPED_NAMES or isinstance(field, SKIPPED_FIELDS):
+            continue
+        fields.append(field.name)
+    return fields
+
+
+def _foreign_keys(model, names=None):
+    for field in model._meta.concrete_fields:
+        if field.many_to_one or field.one_to_one:
+            if names is None or field.name in names:
+                yield field
+
+
+def select_related_for(model, list_display):
+    '''
+    Foreign keys of `list_display`, rendered through their __str__, and the
+    required foreign keys of those: a related __str__ often reads one more
+    relation (i.e. InstituteGroups.display_name and its institute).
+    '''
+    related = []
+    for field in _foreign_keys(model, list_display):
+        related.append(field.name)
+        related += [
+            '%s__%s' % (field.name, target.name)
+            for target in _foreign_keys(field.related_model) if not target.null
+        ]
+    return related
+
+
+class AutoModelAdmin(LeanModelAdmin):
+    '''
+    LeanModelAdmin deriving list_display and list_select_related from the model's fields.
+    '''
+
+    def __init__(self, model, admin_site):
+        super().__init__(model, admin_site)
+        self.list_display = list_display_for(model)
+        self.list_select_related = select_related_for(model, self.list_display)
+
+
+def autoregister(site, models, admin_class=AutoModelAdmin):
+    '''
+    Register every model of `models` not registered yet with `admin_class`.
+    '''
+    for model in models:
+        if not site.is_registered(model):
+            site.register(model, admin_class)
+
+
+class EstimatedCountsAdminSite(MaterialAdminSite):
+    '''
+    MaterialAdminSite whose sidebar counts (MATERIAL_ADMIN_SITE['SHOW_COUNTS'])
+    come from core.counts.cached_count instead of a COUNT(*) per registered
+    model on every admin page.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cached_counts = self.show_counts
+        # MaterialAdminSite counts exactly when show_counts is set
+        self.show_counts = False
+
+    def _build_app_dict(self, request, label=None):
+        app_dict = super()._build_app_dict(request, label)
+        if not self.cached_counts or not app_dict:
+            return app_dict
+        model_admins = {
+            (model._meta.app_label, model._meta.object_name): model_admin
+            for model, model_admin in self._registry.items()
+        }
+        for app in ([app_dict] if label else app_dict.values()):
+            for model_dict in app['models']:
+                model_admin = model_admins[app['app_label'], model_dict['object_name']]
+                model_dict['count'] = cached_count(
+                    model_admin.model, lambda: model_admin.get_queryset(request))
+        return app_dict
@@ -0,0 +1,116 @@
+# core.counts.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+# cache keys being counted in the background
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def estimate_rows(model, using=DEFAULT_DB_ALIAS):
+    '''
+    Planner estimate of the rows in `model`'s table (pg_class.reltuples, as of
+    the last VACUUM/ANALYZE), without scanning it.
+    None when unknown: not PostgreSQL, or a table never analyzed.
+    '''
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)',
+            [connection.ops.quote_name(model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    # -1 (PostgreSQL 14+) for never analyzed tables
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def estimate_threshold():
+    return getattr(settings, 'ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000)
+
+
+def count_rows(queryset):
+    '''
+    Rows of `queryset`: the table's estimate when the queryset is unfiltered
+    and the table has ADMIN_ESTIMATED_COUNT_THRESHOLD rows or more, else COUNT(*).
+    '''
+    query = queryset.query
+    if not query.where and not query.distinct:
+        estimate = estimate_rows(queryset.model, queryset.db)
+        if estimate is not None and estimate >= estimate_threshold():
+            return estimate
+    return queryset.count()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='counts')
+    return _executor
+
+
+def _cache():
+    return caches[getattr(settings, 'ADMIN_COUNTS_CACHE', 'default')]
+
+
+def _store(key, value):
+    # kept past the TTL: a stale count is still shown while it is refreshed
+    _cache().set(key, (value, time.time()), timeout=None)
+    return value
+
+
+def _refresh(key, queryset):
+    close_old_connections()
+    try:
+        _store(key, count_rows(queryset))
+    except Exception:
+        logger.exception('counting %s failed', key)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(key)
+        close_old_connections()
+
+
+def _schedule(key, queryset):
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    get_executor().submit(_refresh, key, queryset)
+
+
+def cached_count(model, get_queryset):
+    '''
+    count_rows(get_queryset()), cached per model for ADMIN_COUNTS_TTL seconds.
+        - a fresh count is returned without any query
+        - a stale one is returned as is while a background thread counts again
+        - a missing one is counted right away on small tables; on big ones the
+          table's estimate (None if get_queryset() is filtered) is returned
+          while it is counted in the background
+    The count is per model, not per user: get_queryset() should not depend on who asks.
+    '''
+    key = 'admin_count:%s' % model._meta.label_lower
+    cached = _cache().get(key)
+    if cached is not None:
+        value, counted_at = cached
+        if time.time() - counted_at >= getattr(settings, 'ADMIN_COUNTS_TTL', 60):
+            _schedule(key, get_queryset())
+        return value
+    queryset = get_queryset()
+    estimate = estimate_rows(model, queryset.db)
+    if estimate is None or estimate < estimate_threshold():
+        return _store(key, queryset.count())
+    _schedule(key, queryset)
+    return None if queryset.query.where else estimate
@@ -0,0 +1,188 @@
+# core.history.py
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models.signals import post_init
+from django.utils import timezone
+from model_utils.fields import AutoLastModifiedField
+from simple_history.models import HistoricalRecords
+from simple_history.signals import post_create_historical_record, pre_create_historical_record
+
+# _HistoryBuffer of the outermost buffered_history() block
+_buffer = contextvars.ContextVar('history_buffer', default=None)
+
+
+class _HistoryBuffer:
+
+    def __init__(self):
+        # {history model: [unsaved history rows]}
+        self.rows = defaultdict(list)
+        # {(history model, pk): last unsaved history row}
+        self.latest = {}
+
+    def add(self, history_model, pk, row):
+        self.rows[history_model].append(row)
+        self.latest[history_model, pk] = row
+
+
+def current_history_user():
+    '''
+    The user HistoryRequestMiddleware recorded for the current request, if any.
+    '''
+    request = getattr(HistoricalRecords.context, 'request', None)
+    user = getattr(request, 'user', None)
+    return user if user is not None and user.is_authenticated else None
+
+
+@contextmanager
+def buffered_history(batch_size=1000, using=DEFAULT_DB_ALIAS):
+    '''
+    Collect the history rows TrackedHistoricalRecords would insert one by one
+    inside the block and write them with one bulk_create per history model
+    (per `batch_size` rows) when it ends, in the same transaction:
+        with buffered_history():
+            for profile in profiles:
+                profile.save()
+    history_user and history_date are taken when each object is saved, so the
+    HistoryRequestMiddleware user is kept. Nested blocks join the outer one.
+    '''
+    if _buffer.get() is not None:
+        yield
+        return
+    buffer = _HistoryBuffer()
+    token = _buffer.set(buffer)
+    try:
+        with transaction.atomic(using=using):
+            yield
+            for history_model, rows in buffer.rows.items():
+                history_model.objects.using(using).bulk_create(rows, batch_size=batch_size)
+                for row in rows:
+                    post_create_historical_record.send(
+                        sender=history_model, instance=row._history_instance, history_instance=row,
+                        history_date=row.history_date, history_user=row.history_user,
+                        history_change_reason=row.history_change_reason, using=using,
+                    )
+    finally:
+        _buffer.reset(token)
+
+
+class TrackedHistoricalRecords(HistoricalRecords):
+    '''
+    HistoricalRecords with
+        - an (<pk>, history_date) index on the history table: one object's
+          history newest first, and prune_history --keep-latest
+        - skip_unchanged (default): a save changing none of the historied
+          fields writes no history row; auto updated timestamps
+          (i.e. TimeStampedModel.modified) don't count as a change.
+          The values loaded with the instance tell what changed; when they
+          say nothing did, the latest history row confirms it, since they
+          are stale after refresh_from_db() or a queryset update().
+    '''
+
+    def __init__(self, *args, skip_unchanged=True, **kwargs):
+        self.skip_unchanged = skip_unchanged
+        super().__init__(*args, **kwargs)
+
+    def get_meta_options(self, model):
+        meta_fields = super().get_meta_options(model)
+        meta_fields['indexes'] = tuple(meta_fields.get('indexes', ())) + (
+            models.Index(fields=(model._meta.pk.attname, 'history_date')),
+        )
+        return meta_fields
+
+    def finalize(self, sender, **kwargs):
+        super().finalize(sender, **kwargs)
+        if self.skip_unchanged and sender is self.cls:
+            self.tracked = [
+                field.attname for field in self.fields_included(sender)
+                if not getattr(field, 'auto_now', False)
+                and not isinstance(field, AutoLastModifiedField)
+            ]
+            post_init.connect(self.post_init, sender=sender, weak=False)
+
+    def snapshot(self, instance):
+        # deferred fields are left out, `list` copies ArrayField values
+        return {
+            attname: list(value) if isinstance(value, list) else value
+            for attname, value in (
+                (attname, instance.__dict__.get(attname, models.DEFERRED)) for attname in self.tracked)
+            if value is not models.DEFERRED
+        }
+
+    def post_init(self, instance, **kwargs):
+        instance._history_snapshot = self.snapshot(instance)
+
+    def latest_record(self, instance, attnames, using=None):
+        '''
+        `attnames` values of the latest history row of `instance`, buffered
+        ones included, None without history.
+        '''
+        history_model = getattr(instance, self.manager_name).model
+        buffer = _buffer.get()
+        row = buffer.latest.get((history_model, instance.pk)) if buffer is not None else None
+        if row is not None:
+            return {attname: getattr(row, attname) for attname in attnames}
+        manager = history_model.objects.using(using) if self.use_base_model_db else history_model.objects
+        # served by the (<pk>, history_date) index
+        return manager.filter(**{instance._meta.pk.attname: instance.pk}).order_by(
+            '-history_date', '-history_id').values(*attnames).first()
+
+    def post_save(self, instance, created, using=None, **kwargs):
+        if self.skip_unchanged and not kwargs.get('raw', False):
+            current = self.snapshot(instance)
+            previous = getattr(instance, '_history_snapshot', None)
+            instance._history_snapshot = current
+            if not created and previous is not None and all(
+                    attname in previous and previous[attname] == value
+                    for attname, value in current.items()
+            ) and self.latest_record(instance, current, using) == current:
+                return
+        super().post_save(instance, created, using=using, **kwargs)
+
+    def create_historical_record(self, instance, history_type, using=None):
+        buffer = _buffer.get()
+        if buffer is None or self.m2m_fields:
+            return super().create_historical_record(instance, history_type, using=using)
+        # HistoricalRecords.create_historical_record, minus the save()
+        using = using if self.use_base_model_db else None
+        history_date = getattr(instance, '_history_date', timezone.now())
+        history_user = self.get_history_user(instance)
+        history_change_reason = self.get_change_reason_for_object(instance, history_type, using)
+        history_model = getattr(instance, self.manager_name).model
+        attrs = {field.attname: getattr(instance, field.attname) for field in self.fields_included(instance)}
+        if getattr(history_model, 'history_relation', None) is not None:
+            attrs['history_relation'] = instance
+        row = history_model(
+            history_date=history_date,
+            history_type=history_type,
+            history_user=history_user,
+            history_change_reason=history_change_reason,
+            **attrs,
+        )
+        pre_create_historical_record.send(
+            sender=history_model, instance=instance, history_date=history_date,
+            history_user=history_user, history_change_reason=history_change_reason,
+            history_instance=row, using=using,
+        )
+        row._history_instance = instance
+        buffer.add(history_model, instance.pk, row)
+
+
+def retention_days(model):
+    '''
+    Days of history kept for `model` (HISTORY_RETENTION_DAYS by model label,
+    '*' for the others), None to keep it all.
+    '''
+    retention = getattr(settings, 'HISTORY_RETENTION_DAYS', {})
+    return retention.get(model._meta.label, retention.get('*'))
+
+
+def historied_models():
+    return [
+        model for model in apps.get_models()
+        if hasattr(model._meta, 'simple_history_manager_attribute')
+    ]
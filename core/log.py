@@ -0,0 +1,81 @@
+# core.log.py
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+
+class Event:
+    '''
+    A structured log record body, serialized to JSON only when a handler
+    formats it (with AsyncHandler, in the logging thread, before queuing):
+        logger.info('%s', Event('user_created', user_id=user.pk))
+    '''
+    __slots__ = ('name', 'fields')
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+
+    def __str__(self):
+        return json.dumps(dict(event=self.name, **self.fields), default=str)
+
+
+def log_event(logger, level, name, **fields):
+    '''
+    Log Event(name, **fields) at `level`, nothing is built when the level is disabled.
+    '''
+    if logger.isEnabledFor(level):
+        logger.log(level, '%s', Event(name, **fields), stacklevel=2)
+
+
+class AsyncHandler(QueueHandler):
+    '''
+    Hand records to a background thread writing them to `stream`, so the
+    calling (request) thread never waits on I/O. Messages are formatted
+    before they are queued, while their arguments (model instances, lists)
+    are still what was logged. When `maxsize` records are waiting new ones
+    are dropped and counted instead of blocking.
+    The listener thread starts with the first record of each process: a
+    forked worker (i.e. gunicorn --preload) gets its own queue and thread.
+        'handlers': {'async': {'()': 'core.log.AsyncHandler', 'formatter': ...}}
+    '''
+
+    def __init__(self, stream=None, maxsize=10000):
+        # writes the already formatted messages as they are
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.listener = None
+        self.pid = None
+        super().__init__(queue.Queue(maxsize))
+
+    def start(self):
+        # runs under the handler lock (Handler.handle), reinitialized after fork
+        self.queue = queue.Queue(self.maxsize)
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+        self.pid = os.getpid()
+        atexit.register(self.stop)
+
+    def stop(self):
+        # flushes the waiting records, safe to call more than once
+        if self.pid == os.getpid() and self.listener._thread is not None:
+            self.listener.stop()
+
+    def enqueue(self, record):
+        if self.pid != os.getpid():
+            # first record, or the first one since a fork: the thread didn't survive it
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self.stop()
+        self.target.close()
+        super().close()
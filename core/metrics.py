@@ -0,0 +1,158 @@
+# core.metrics.py
+import contextvars
+import ipaddress
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+# request durations, seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+current_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    '''
+    What one request cost: queries (sql, params, seconds) and template render time.
+    '''
+
+    def __init__(self):
+        self.queries = []
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper() hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, params, time.perf_counter() - started))
+
+    @property
+    def db_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    def duplicates(self):
+        '''
+        {sql: times} of the statements run more than once with the same parameters.
+        '''
+        counts = Counter((sql, repr(params)) for sql, params, _ in self.queries)
+        return {sql: count for (sql, _), count in counts.items() if count > 1}
+
+
+class InstrumentedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        stats = current_stats.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    '''
+    DjangoTemplates adding each render() time to the current RequestStats.
+    Only templates rendered by views are timed, {% include %} and
+    {% extends %} are part of their parent's time.
+    '''
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+class Registry:
+    '''
+    In-process request metrics per view, method and status,
+    exposed in the Prometheus text format by metrics_view.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = Counter()
+        self.slow_requests = Counter()
+        self.sums = defaultdict(float)
+        self.buckets = defaultdict(lambda: [0] * len(BUCKETS))
+
+    def observe(self, view, method, status, duration, stats, size, slow):
+        labels = (view, method, str(status))
+        with self.lock:
+            self.requests[labels] += 1
+            if slow:
+                self.slow_requests[labels] += 1
+            self.sums['request_duration_seconds', labels] += duration
+            self.sums['db_queries', labels] += len(stats.queries)
+            self.sums['db_duplicate_queries', labels] += sum(stats.duplicates().values())
+            self.sums['db_time_seconds', labels] += stats.db_time
+            self.sums['template_render_seconds', labels] += stats.template_time
+            if size is not None:
+                self.sums['response_bytes', labels] += size
+            buckets = self.buckets[labels]
+            for index, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    buckets[index] += 1
+
+    def render(self):
+        def label_text(labels, **extra):
+            pairs = list(zip(('view', 'method', 'status'), labels)) + list(extra.items())
+            return ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                            for key, value in pairs)
+
+        lines = []
+        with self.lock:
+            lines.append('# TYPE django_requests_total counter')
+            for labels, count in sorted(self.requests.items()):
+                lines.append('django_requests_total{%s} %d' % (label_text(labels), count))
+            lines.append('# TYPE django_slow_requests_total counter')
+            for labels, count in sorted(self.slow_requests.items()):
+                lines.append('django_slow_requests_total{%s} %d' % (label_text(labels), count))
+            lines.append('# TYPE django_request_duration_seconds histogram')
+            for labels, buckets in sorted(self.buckets.items()):
+                for bound, count in zip(BUCKETS, buckets):
+                    lines.append('django_request_duration_seconds_bucket{%s} %d' % (
+                        label_text(labels, le=bound), count))
+                lines.append('django_request_duration_seconds_bucket{%s} %d' % (
+                    label_text(labels, le='+Inf'), self.requests[labels]))
+                lines.append('django_request_duration_seconds_sum{%s} %r' % (
+                    label_text(labels), self.sums['request_duration_seconds', labels]))
+                lines.append('django_request_duration_seconds_count{%s} %d' % (
+                    label_text(labels), self.requests[labels]))
+            for name in sorted({name for name, _ in self.sums} - {'request_duration_seconds'}):
+                lines.append('# TYPE django_%s_total counter' % name)
+                for (sum_name, labels), value in sorted(self.sums.items()):
+                    if sum_name == name:
+                        lines.append('django_%s_total{%s} %r' % (name, label_text(labels), value))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def metrics_view(request):
+    '''
+    Prometheus scrape endpoint, for staff users and `METRICS_ALLOWED_IPS`.
+    '''
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+        from_allowed = any(address in ipaddress.ip_network(network, strict=False) for network in allowed)
+    except ValueError:
+        from_allowed = False
+    if not from_allowed and not request.user.is_staff:
+        raise PermissionDenied
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
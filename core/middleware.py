@@ -0,0 +1,292 @@
+# core.middleware.py
+import logging
+import mimetypes
+import os
+import re
+import stat
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections
+from django.http import (
+    FileResponse, HttpResponse, HttpResponseNotFound, HttpResponseNotModified, StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+from .log import log_event
+from .metrics import RequestStats, current_stats, registry
+from .storage import IMMUTABLE_CACHE_CONTROL, REFS_SUFFIX, is_content_addressed
+
+request_logger = logging.getLogger('core.requests')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# ManifestStaticFilesStorage names, i.e. css/style.5f2b0c1d9e8a.css
+HASHED_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+# precompressed variants next to a file, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# never served: ContentAddressedStorage bookkeeping
+REFUSED_SUFFIXES = (REFS_SUFFIX,)
+CHUNK_SIZE = 64 * 1024
+
+
+def _url_prefix(url):
+    return '/' + url.strip('/') + '/' if url else None
+
+
+def accepted_encodings(header):
+    '''
+    {coding: q} of an Accept-Encoding header, `gzip;q=0` (refused) included.
+    '''
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def accepts_encoding(accepted, coding):
+    return accepted.get(coding, accepted.get('*', 0.0)) > 0
+
+
+class FileServingMiddleware:
+    '''
+    Serve MEDIA_ROOT and static files (STATIC_ROOT, then STATICFILES_DIRS)
+    before the rest of the request cycle: no session, auth or URL resolving.
+        - FileResponse, so servers with wsgi.file_wrapper use sendfile()
+        - ETag/Last-Modified with 304 on If-None-Match/If-Modified-Since
+        - single byte range requests (206/416)
+        - precompressed .br/.gz variants written by collectstatic, each
+          with its own ETag
+        - immutable cache headers for hashed static and content addressed media names
+    Keep it at the top of MIDDLEWARE, right after SecurityMiddleware.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.max_age = getattr(settings, 'FILE_SERVING_MAX_AGE', 60 * 60)
+        self.mounts = []
+        media_prefix = _url_prefix(settings.MEDIA_URL)
+        if media_prefix and settings.MEDIA_ROOT:
+            self.mounts.append((media_prefix, [str(settings.MEDIA_ROOT)]))
+        static_prefix = _url_prefix(settings.STATIC_URL)
+        if static_prefix:
+            roots = [str(settings.STATIC_ROOT)] if getattr(settings, 'STATIC_ROOT', None) else []
+            roots += [str(root[1] if isinstance(root, (list, tuple)) else root)
+                      for root in getattr(settings, 'STATICFILES_DIRS', [])]
+            self.mounts.append((static_prefix, roots))
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD'):
+            for prefix, roots in self.mounts:
+                if request.path_info.startswith(prefix):
+                    response = self.serve(request, request.path_info[len(prefix):], roots)
+                    if response is not None:
+                        return response
+        return self.get_response(request)
+
+    def find(self, path, roots):
+        for root in roots:
+            try:
+                full_path = safe_join(root, path)
+            except (SuspiciousFileOperation, ValueError):
+                return None, None
+            try:
+                stat_result = os.stat(full_path)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            if stat.S_ISREG(stat_result.st_mode):
+                return full_path, stat_result
+        return None, None
+
+    def cache_control(self, path):
+        if is_content_addressed(path) or HASHED_RE.search(path):
+            return IMMUTABLE_CACHE_CONTROL
+        return 'public, max-age=%d' % self.max_age
+
+    def serve(self, request, path, roots):
+        if path.endswith(REFUSED_SUFFIXES):
+            # not left to the URLconf either
+            return HttpResponseNotFound()
+        full_path, stat_result = self.find(path, roots)
+        if full_path is None:
+            # unknown files go on to the URLconf (i.e. a 404 page)
+            return None
+
+        content_type, encoding = mimetypes.guess_type(full_path)
+        content_type = content_type or 'application/octet-stream'
+        if encoding:
+            # i.e. a .gz download, don't let the browser inflate it
+            content_type = 'application/octet-stream'
+
+        range_header = request.META.get('HTTP_RANGE')
+        if range_header:
+            # ranges of the file itself, never of a compressed variant
+            serve_path, content_encoding, serve_stat = full_path, None, stat_result
+        else:
+            serve_path, content_encoding, serve_stat = self.precompressed(request, full_path, stat_result)
+        etag = '"%x-%x%s"' % (
+            serve_stat.st_mtime_ns, serve_stat.st_size, '-' + content_encoding if content_encoding else '')
+        headers = {
+            'ETag': etag,
+            'Last-Modified': http_date(stat_result.st_mtime),
+            'Cache-Control': self.cache_control(path),
+            'Accept-Ranges': 'bytes',
+        }
+        if content_encoding or content_type.startswith('text/') or content_type in (
+                'application/javascript', 'image/svg+xml'):
+            headers['Vary'] = 'Accept-Encoding'
+        if self.not_modified(request, etag, stat_result.st_mtime):
+            response = HttpResponseNotModified()
+        elif range_header:
+            response = self.partial(full_path, stat_result.st_size, range_header, content_type)
+        else:
+            response = FileResponse(open(serve_path, 'rb'), content_type=content_type)
+            # FileResponse guesses the type (and disposition) from the served file's name
+            response['Content-Type'] = content_type
+            del response['Content-Disposition']
+            if content_encoding:
+                response['Content-Encoding'] = content_encoding
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    def not_modified(self, request, etag, mtime):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            return if_none_match.strip() == '*' or etag in [
+                tag.strip().replace('W/', '', 1) for tag in if_none_match.split(',')]
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return if_modified_since is not None and int(mtime) <= if_modified_since
+
+    def precompressed(self, request, full_path, stat_result):
+        '''
+        (path, Content-Encoding, stat) of the variant to serve, the file
+        itself (encoding None) when no accepted variant is up to date.
+        '''
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        for encoding, suffix in ENCODINGS:
+            if not accepts_encoding(accepted, encoding):
+                continue
+            try:
+                compressed = os.stat(full_path + suffix)
+            except FileNotFoundError:
+                continue
+            # a stale variant (older than the file) is ignored
+            if compressed.st_mtime >= stat_result.st_mtime:
+                return full_path + suffix, encoding, compressed
+        return full_path, None, stat_result
+
+    def partial(self, full_path, size, range_header, content_type):
+        match = RANGE_RE.match(range_header.strip())
+        if not match or not any(match.groups()):
+            # multiple or malformed ranges: the whole file
+            return FileResponse(open(full_path, 'rb'), content_type=content_type)
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1
+        if start > end or start >= size:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */%d' % size
+            return response
+        length = end - start + 1
+
+        def read():
+            with open(full_path, 'rb') as file:
+                file.seek(start)
+                remaining = length
+                while remaining > 0:
+                    chunk = file.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+
+        response = StreamingHttpResponse(read(), status=206, content_type=content_type)
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+        return response
+
+
+class InstrumentationMiddleware:
+    '''
+    Per request SQL query count, DB time, repeated queries, template render
+    time, response size and duration:
+        - one structured (core.log.Event) record on the `core.requests` logger
+        - aggregated per view in core.metrics.registry, see metrics_view
+        - requests slower than SLOW_REQUEST_THRESHOLD_MS log a warning with their queries
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 500) / 1000
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        duration = time.perf_counter() - started
+        self.record(request, response, stats, duration)
+        return response
+
+    def response_size(self, response):
+        if not response.streaming:
+            return len(response.content)
+        if response.has_header('Content-Length'):
+            return int(response['Content-Length'])
+        return None
+
+    def record(self, request, response, stats, duration):
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        size = self.response_size(response)
+        slow = duration >= self.slow_threshold
+        registry.observe(view, request.method, response.status_code, duration, stats, size, slow)
+
+        if slow:
+            log_event(
+                request_logger, logging.WARNING, 'slow_request',
+                path=request.path,
+                view=view,
+                duration_ms=round(duration * 1000, 2),
+                queries=[
+                    {'sql': sql, 'ms': round(seconds * 1000, 2)} for sql, _, seconds in stats.queries
+                ],
+                duplicates=stats.duplicates(),
+            )
+        else:
+            log_event(
+                request_logger, logging.INFO, 'request',
+                method=request.method,
+                path=request.path,
+                view=view,
+                status=response.status_code,
+                duration_ms=round(duration * 1000, 2),
+                queries=len(stats.queries),
+                duplicate_queries=sum(stats.duplicates().values()),
+                db_ms=round(stats.db_time * 1000, 2),
+                template_ms=round(stats.template_time * 1000, 2),
+                bytes=size,
+            )
@@ -51,13 +51,16 @@ ALLOWED_HOSTS = config('ALLOWED_HOSTS', cast=Csv())
 
 INSTALLED_APPS = [
     'material',
-    'material.admin',
+    # material.admin with core.autoadmin.EstimatedCountsAdminSite
+    'core.apps.MaterialAdminConfig',
     # 'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # SearchVectorField, pg_trgm lookups (accounts.search)
+    'django.contrib.postgres',
     # thirgparty apps
     'crispy_forms',
     'django_extensions',
@@ -75,10 +78,16 @@ CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # MEDIA_ROOT and static files, ahead of sessions and auth
+    'core.middleware.FileServingMiddleware',
+    # per request query count, DB/template time and size, see core.metrics
+    'core.middleware.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # request.entitlement, the user's paid status (institude.entitlements)
+    'institude.entitlements.EntitlementMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'simple_history.middleware.HistoryRequestMiddleware',
@@ -87,10 +96,19 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'core.urls'
 AUTH_USER_MODEL = 'accounts.User'
 
+AUTHENTICATION_BACKENDS = [
+    # ModelBackend with cross-request permission cache
+    'accounts.backends.CachedModelBackend',
+    # object permissions on institutes from InstituteMembership
+    'institude.backends.InstitutePermissionBackend',
+]
+
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates timing renders for InstrumentationMiddleware
+        'BACKEND': 'core.metrics.InstrumentedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': ['templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -130,6 +148,26 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # shared by every worker process of the host
+    'permissions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('PERMISSIONS_CACHE_LOCATION', default=str(BASE_DIR / '.cache' / 'permissions')),
+    },
+}
+
+# cache alias and timeout (seconds) of effective user permission sets
+PERMISSIONS_CACHE = 'permissions'
+PERMISSIONS_CACHE_TIMEOUT = config('PERMISSIONS_CACHE_TIMEOUT', default=300, cast=int)
+
+# cache alias and timeout (seconds) of users' paid status (institude.entitlements)
+ENTITLEMENTS_CACHE = 'permissions'
+ENTITLEMENTS_CACHE_TIMEOUT = config('ENTITLEMENTS_CACHE_TIMEOUT', default=300, cast=int)
+
+
 REST_FRAMEWORK = {
     # 'DEFAULT_PERMISSION_CLASSES': [
     #     'rest_framework.permissions.IsAuthenticated',
@@ -191,10 +229,29 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
     # '/var/www/static/',
 ]
+# collectstatic output: hashed names, manifest and .gz/.br variants
+STATIC_ROOT = config('STATIC_ROOT', default=str(BASE_DIR / 'staticfiles'))
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+# requests slower than this (milliseconds) are logged with their queries
+SLOW_REQUEST_THRESHOLD_MS = config('SLOW_REQUEST_THRESHOLD_MS', default=500, cast=int)
+# clients allowed to scrape /metrics without a staff login
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())
+# p95 target (milliseconds) of the user search autocomplete, see benchmark_user_search
+USER_SEARCH_P95_MS = config('USER_SEARCH_P95_MS', default=50, cast=int)
+
+# Cache-Control max-age (seconds) of files without a hashed or content addressed name
+FILE_SERVING_MAX_AGE = config('FILE_SERVING_MAX_AGE', default=3600, cast=int)
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / "media"
 
+# avatar variants written next to the original, {'<variant>': <max side in px>}
+AVATAR_THUMBNAIL_SIZES = {'sm': 64, 'md': 256}
+# background threads processing uploaded avatars
+AVATAR_WORKERS = config('AVATAR_WORKERS', default=2, cast=int)
+# uploaded images are named after their content, stored once per upload_to directory (core.storage)
+MEDIA_CONTENT_ADDRESSED = config('MEDIA_CONTENT_ADDRESSED', default=True, cast=bool)
+
 
 
 # Default primary key field type
@@ -210,6 +267,18 @@ LOGIN_URL = '/accounts/login/'
 
 
 
+# days of simple_history rows kept per model label, '*' for the others, None to keep
+# everything; pruned by `manage.py prune_history`
+HISTORY_RETENTION_DAYS = {
+    '*': config('HISTORY_RETENTION_DAYS', default=365, cast=int),
+}
+
+# admin changelists of bigger unfiltered tables show the planner's row estimate (core.autoadmin)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = config('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=100000, cast=int)
+# cache alias and seconds before the admin sidebar counts are refreshed in the background (core.counts)
+ADMIN_COUNTS_CACHE = 'permissions'
+ADMIN_COUNTS_TTL = config('ADMIN_COUNTS_TTL', default=60, cast=int)
+
 MATERIAL_ADMIN_SITE = {
     'HEADER':  ('Education Management System'),  # Admin site header
     'TITLE':  ('education management system'),  # Admin site title
@@ -272,3 +341,40 @@ SIMPLE_JWT = {
 }
 
 
+
+
+# Predicate used by the user type proxy managers (Teacher.objects, ...)
+# 'gin': `types @> ARRAY[type]` on the GIN index, 'bitmask': `types_mask & bit`
+USER_TYPES_LOOKUP = config('USER_TYPES_LOOKUP', default='gin')
+
+
+# Logging: records go through core.log.AsyncHandler, a background thread
+# writes them to stderr so request threads never block on it.
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'async': {
+            '()': 'core.log.AsyncHandler',
+            'formatter': 'plain',
+        },
+    },
+    'root': {
+        'handlers': ['async'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        'accounts': {'level': LOG_LEVEL},
+        'institude': {'level': LOG_LEVEL},
+        'u_dashboard': {'level': LOG_LEVEL},
+        # one JSON record per request, see core.middleware.InstrumentationMiddleware
+        'core.requests': {'level': config('REQUESTS_LOG_LEVEL', default='INFO')},
+    },
+}
@@ -0,0 +1,189 @@
+# core.storage.py
+import glob
+import gzip
+import hashlib
+import os
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import locks
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils.functional import LazyObject
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# <sha256>.<ext>, and <sha256>_<variant>.<ext> for the names derived from it
+CONTENT_NAME_RE = re.compile(r'(?:^|/)[0-9a-f]{64}(?P<derived>_[^/.]+)?(?:\.[^/.]+)?$')
+# reference count sidecar of a content addressed file
+REFS_SUFFIX = '.refs'
+# far future, the content behind a content addressed name never changes
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def is_content_addressed(name):
+    return CONTENT_NAME_RE.search(name.replace('\\', '/')) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    '''
+    FileSystemStorage naming uploads after the sha256 of their content, in
+    the directory chosen by the field's upload_to:
+        <upload_to directory>/<sha256>.<ext>
+    Identical uploads to one directory share one file. Every save of an
+    existing file adds a reference, kept in a locked `.refs` sidecar, and
+    delete() only removes the file with its last reference.
+
+    Names derived from a stored file (i.e. `<sha256>_sm.<ext>` avatar
+    variants) are written as given and removed together with it.
+    Other names (defaults, uploads made before) behave like in
+    FileSystemStorage.
+    '''
+
+    def is_content_addressed(self, name):
+        return is_content_addressed(name)
+
+    def is_derived(self, name):
+        match = CONTENT_NAME_RE.search(name.replace('\\', '/'))
+        return match is not None and match.group('derived') is not None
+
+    def content_name(self, name, content):
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, sha256.hexdigest() + extension)
+
+    @contextmanager
+    def references(self, name):
+        '''
+        Exclusive access to the reference count of `name`: yields a one item
+        list, the count written back is the item on exit.
+        '''
+        path = self.path(name) + REFS_SUFFIX
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a+') as refs:
+            locks.lock(refs, locks.LOCK_EX)
+            try:
+                refs.seek(0)
+                count = [int(refs.read() or 0)]
+                yield count
+                # kept at 0 rather than removed: a waiting process holds this very file
+                refs.seek(0)
+                refs.truncate()
+                refs.write(str(count[0]))
+            finally:
+                locks.unlock(refs)
+
+    def original_name(self, name):
+        base, extension = os.path.splitext(name)
+        return base.rsplit('_', 1)[0] + extension
+
+    def get_available_name(self, name, max_length=None):
+        if self.is_content_addressed(name):
+            # the name is decided in _save(), the content decides it
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if self.is_derived(name):
+            # under the lock of the file it's derived from, so it isn't deleted meanwhile
+            with self.references(self.original_name(name)) as count:
+                if count[0] and not self.exists(name):
+                    super()._save(name, content)
+            return name
+        name = self.content_name(name, content)
+        with self.references(name) as count:
+            if not self.exists(name):
+                super()._save(name, content)
+            count[0] += 1
+        return name
+
+    def delete(self, name):
+        if not name or not self.is_content_addressed(name):
+            return super().delete(name)
+        if self.is_derived(name):
+            # goes away with the file it's derived from
+            return
+        with self.references(name) as count:
+            count[0] = max(count[0] - 1, 0)
+            if count[0] == 0:
+                super().delete(name)
+                base, extension = os.path.splitext(self.path(name))
+                for derived in glob.glob(glob.escape(base) + '_*' + extension):
+                    os.remove(derived)
+
+    def references_count(self, name):
+        try:
+            with open(self.path(name) + REFS_SUFFIX) as refs:
+                return int(refs.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+
+class _ContentAddressedStorage(LazyObject):
+    def _setup(self):
+        self._wrapped = ContentAddressedStorage()
+
+
+content_addressed_storage = _ContentAddressedStorage()
+
+
+def media_storage():
+    '''
+    storage= callable of the image fields, content addressed unless
+    `MEDIA_CONTENT_ADDRESSED` is off.
+    '''
+    if getattr(settings, 'MEDIA_CONTENT_ADDRESSED', True):
+        return content_addressed_storage
+    return default_storage
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    '''
+    ManifestStaticFilesStorage also writing .gz (and .br, with the optional
+    `brotli` package) next to every compressible collected file, served by
+    core.middleware.FileServingMiddleware. Names missing from the manifest
+    fall back to the unhashed name instead of raising.
+    '''
+    manifest_strict = False
+    compress_extensions = ('.css', '.js', '.svg', '.html', '.txt', '.json', '.xml', '.map', '.ico')
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except (ValueError, SuspiciousFileOperation):
+            # not collected (i.e. tests without collectstatic) or outside STATIC_ROOT
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed = []
+        for name, hashed_name, done in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(done, Exception):
+                processed.extend({name, hashed_name})
+            yield name, hashed_name, done
+        if not dry_run:
+            for name in processed:
+                self.compress(name)
+
+    def compress(self, name):
+        if not name.endswith(self.compress_extensions) or not self.exists(name):
+            return
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            content = source.read()
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(content):
+                with open(path + suffix, 'wb') as target:
+                    target.write(compressed)
@@ -0,0 +1,47 @@
+# core.testing.py
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetTestCase(TestCase):
+    '''
+    TestCase with per-view query budgets:
+        with self.assertQueryBudget(4):
+            self.client.get(url)
+    fails when the block runs more queries than the budget, listing them and
+    the ones repeated (the usual N+1 sign).
+    '''
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed <= budget:
+            return
+        queries = [query['sql'] for query in context.captured_queries]
+        repeated = [(sql, count) for sql, count in Counter(queries).items() if count > 1]
+        lines = ['%d queries executed, the budget is %d:' % (executed, budget)]
+        lines += ['%d. %s' % (number, sql) for number, sql in enumerate(queries, start=1)]
+        if repeated:
+            lines.append('repeated:')
+            lines += ['%dx %s' % (count, sql) for sql, count in repeated]
+        self.fail('\n'.join(lines))
+
+    def assertConstantQueries(self, func, grow):
+        '''
+        `func` runs the same number of queries before and after `grow()` adds rows.
+        '''
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as before:
+            func()
+        grow()
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as after:
+            func()
+        self.assertEqual(
+            len(before.captured_queries), len(after.captured_queries),
+            'query count grows with the data:\n%s' % '\n'.join(
+                query['sql'] for query in after.captured_queries))
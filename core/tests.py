@@ -0,0 +1,138 @@
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.log import AsyncHandler
+from core.middleware import FileServingMiddleware
+from core.storage import ContentAddressedStorage
+
+REFS_NAME = 'accounts/user/avatar/%s.png.refs' % ('0' * 64)
+
+
+class FileServingMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.write('style.css', b'body { color: red; }' * 10)
+        self.write('style.css.gz', gzip.compress(b'body { color: red; }' * 10))
+        self.write('style.css.br', b'brotli')
+        self.write(REFS_NAME, b'1')
+        settings = override_settings(MEDIA_URL='/media/', MEDIA_ROOT=self.root, STATIC_URL=None)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.middleware = FileServingMiddleware(lambda request: HttpResponse(status=418))
+
+    def write(self, name, content):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(content)
+
+    def get(self, path, **headers):
+        response = self.middleware(RequestFactory().get('/media/' + path, **headers))
+        if response.streaming:
+            response.close()
+        return response
+
+    def test_refs_sidecar_is_refused(self):
+        self.assertEqual(self.get(REFS_NAME).status_code, 404)
+
+    def test_accept_encoding_q_values(self):
+        for accept_encoding, encoding in (
+                ('gzip, br', 'br'),
+                ('gzip, br;q=0', 'gzip'),
+                ('br;q=0, *', 'gzip'),
+                ('*;q=0', None),
+                ('identity', None),
+                ('', None)):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.get('style.css', HTTP_ACCEPT_ENCODING=accept_encoding)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get('Content-Encoding'), encoding)
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_etag_per_encoding(self):
+        etags = {
+            encoding: self.get('style.css', HTTP_ACCEPT_ENCODING=encoding)['ETag']
+            for encoding in ('br', 'gzip', 'identity')
+        }
+        self.assertEqual(len(set(etags.values())), 3)
+        # a gzip ETag doesn't validate the brotli variant
+        response = self.get('style.css', HTTP_ACCEPT_ENCODING='br', HTTP_IF_NONE_MATCH=etags['gzip'])
+        self.assertEqual(response.status_code, 200)
+        response = self.get('style.css', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etags['gzip'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etags['gzip'])
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = ContentAddressedStorage(location=directory.name)
+
+    def test_named_by_content_in_the_upload_to_directory(self):
+        digest = hashlib.sha256(b'image').hexdigest()
+        first = self.storage.save('accounts/user/avatar/a1/1/1_photo.PNG', ContentFile(b'image'))
+        self.assertEqual(first, 'accounts/user/avatar/a1/1/%s.png' % digest)
+        self.assertEqual(self.storage.save('accounts/user/avatar/a1/1/2_copy.png', ContentFile(b'image')), first)
+        other = self.storage.save('institude/logo/logo.png', ContentFile(b'image'))
+        self.assertEqual(other, 'institude/logo/%s.png' % digest)
+        self.assertEqual(self.storage.references_count(first), 2)
+
+        variant = self.storage.save(first.replace('.png', '_sm.png'), ContentFile(b'small'))
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+        self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertFalse(self.storage.exists(variant))
+        self.assertTrue(self.storage.exists(other))
+
+
+class AsyncHandlerTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'log')
+        self.stream = open(self.path, 'a')
+        self.addCleanup(self.stream.close)
+        self.handler = AsyncHandler(self.stream)
+        self.handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        self.addCleanup(self.handler.close)
+        self.logger = logging.getLogger('core.tests.async')
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+    def lines(self):
+        with open(self.path) as log:
+            return log.read().splitlines()
+
+    def test_formatted_when_logged(self):
+        types = [1]
+        self.logger.warning('types %s', types)
+        types.append(2)
+        self.handler.stop()
+        self.assertEqual(self.lines(), ['WARNING types [1]'])
+
+    def test_forked_child_logs(self):
+        self.logger.warning('parent')
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.logger.warning('child')
+                self.handler.stop()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        self.handler.stop()
+        self.assertEqual(sorted(self.lines()), ['WARNING child', 'WARNING parent'])
@@ -16,10 +16,10 @@ Including another URLconf
 
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.authtoken.views import obtain_auth_token
+from .metrics import metrics_view
 from .views import MyTokenObtainPairView
 
 
@@ -31,11 +31,14 @@ urlpatterns = [
     # for django login/signup page
     path('user/', include('accounts.urls')),
     path('institute/', include('institude.urls')),
+    # Prometheus scrape endpoint
+    path('metrics', metrics_view, name='metrics'),
 
 
 
     # path('user/login-api/',obtain_auth_token),
     # path('user/token/',MyTokenObtainPairView.as_view()),
     # path('user/token/refresh/',TokenRefreshView.as_view()),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
+# MEDIA_ROOT and static files are served by core.middleware.FileServingMiddleware
 
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class InstitudeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'institude'
+
+    def ready(self):
+        # PaymentStatus receivers invalidating cached entitlements
+        from . import entitlements  # noqa: F401
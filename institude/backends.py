@@ -0,0 +1,92 @@
+# institude.backends.py
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import BaseBackend
+from django.db.models import Q
+
+from .models import Institude, InstituteGroups, InstituteMembership, InstituteRole
+
+User = get_user_model()
+
+_VIEW = {
+    'institude.view_institude',
+    'institude.view_institutegroups',
+}
+_MANAGE_GROUPS = _VIEW | {
+    'institude.change_institutegroups',
+}
+# permissions every role grants on its own institute
+ROLE_PERMISSIONS = {
+    InstituteRole.CONTROLLER: _MANAGE_GROUPS | {
+        'institude.change_institude',
+        'institude.delete_institude',
+    },
+    InstituteRole.TEACHERS: _MANAGE_GROUPS,
+    InstituteRole.EMPLOYEES: _VIEW,
+    InstituteRole.STUDENTS: _VIEW,
+    InstituteRole.GUARDIANS: _VIEW,
+}
+
+
+class InstitutePermissionBackend(BaseBackend):
+    '''
+    Object permissions on an institute (or one of its InstituteGroups),
+        user.has_perm('institude.change_institutegroups', institute)
+    answered from the user's roles in InstituteMembership, a single indexed
+    lookup per institute and request. The owner has the controller role.
+    '''
+    supports_object_permissions = True
+    # no permission without an institute, BaseCommonUserManager.with_perm skips it then
+    supports_model_permissions = False
+
+    @staticmethod
+    def _institute_id(obj):
+        if isinstance(obj, Institude):
+            return obj.pk, obj.owner_id
+        if isinstance(obj, InstituteGroups):
+            # owner_id is only known when `institutes` is already loaded
+            institute = InstituteGroups.institutes.field.get_cached_value(obj, None)
+            return obj.institutes_id, institute.owner_id if institute else None
+        return None, None
+
+    def get_roles(self, user_obj, obj):
+        institute_id, owner_id = self._institute_id(obj)
+        if institute_id is None or not user_obj.is_active or user_obj.is_anonymous:
+            return set()
+        if not hasattr(user_obj, '_institute_roles_cache'):
+            user_obj._institute_roles_cache = {}
+        cache = user_obj._institute_roles_cache
+        if institute_id not in cache:
+            roles = set(InstituteMembership.objects.filter(
+                user_id=user_obj.pk, institute_id=institute_id,
+            ).values_list('role', flat=True))
+            cache[institute_id] = roles
+        roles = cache[institute_id]
+        if owner_id is not None and owner_id == user_obj.pk:
+            roles = roles | {InstituteRole.CONTROLLER}
+        return roles
+
+    def get_all_permissions(self, user_obj, obj=None):
+        perms = set()
+        for role in self.get_roles(user_obj, obj):
+            perms |= ROLE_PERMISSIONS.get(role, set())
+        return perms
+
+    def has_perm(self, user_obj, perm, obj=None):
+        return perm in self.get_all_permissions(user_obj, obj)
+
+    def with_perm(self, perm, is_active=True, include_superusers=True, obj=None):
+        institute_id, _ = self._institute_id(obj)
+        if institute_id is None:
+            return User._default_manager.none()
+        roles = [role for role, perms in ROLE_PERMISSIONS.items() if perm in perms]
+        user_q = Q(pk__in=InstituteMembership.objects.filter(
+            institute_id=institute_id, role__in=roles,
+        ).values('user_id'))
+        if InstituteRole.CONTROLLER in roles:
+            user_q |= Q(pk__in=Institude.objects.filter(
+                pk=institute_id).values('owner_id'))
+        if include_superusers:
+            user_q |= Q(is_superuser=True)
+        if is_active is not None:
+            user_q &= Q(is_active=is_active)
+        return User._default_manager.filter(user_q)
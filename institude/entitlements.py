@@ -0,0 +1,139 @@
+# institude.entitlements.py
+import calendar
+import datetime
+from collections import namedtuple
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.shortcuts import HttpResponseRedirect, reverse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from .models import PaymentStatus, User
+
+PAYMENT_REQUIRED_MESSAGE = "You don't have permissions! Pay first"
+
+
+class Entitlement(namedtuple('Entitlement', ['status', 'expires_at'])):
+    '''
+    Paid status of a user, `expires_at` is None for payments without a duration.
+    '''
+
+    @property
+    def active(self):
+        return bool(self.status) and (self.expires_at is None or timezone.now() < self.expires_at)
+
+    def __bool__(self):
+        return self.active
+
+
+NOT_ENTITLED = Entitlement(False, None)
+
+
+def add_months(moment, months):
+    month = moment.month - 1 + months
+    year, month = moment.year + month // 12, month % 12 + 1
+    day = min(moment.day, calendar.monthrange(year, month)[1])
+    return moment.replace(year=year, month=month, day=day)
+
+
+def entitlement_for(payment):
+    if payment is None:
+        return NOT_ENTITLED
+    status, duration_month, updated_at = payment
+    expires_at = add_months(updated_at, duration_month) if duration_month else None
+    return Entitlement(status, expires_at)
+
+
+def entitlements_cache():
+    return caches[getattr(settings, 'ENTITLEMENTS_CACHE', 'default')]
+
+
+def entitlement_cache_key(user_id):
+    return 'entitlement:%s' % user_id
+
+
+def get_entitlement(user):
+    '''
+    Entitlement of `user`: from its already loaded payment_status
+    (CachedModelBackend selects it with the user), else from the cache,
+    else one query, cached until it expires.
+    '''
+    if not user.is_authenticated:
+        return NOT_ENTITLED
+    # on the concrete model: request.user is a SimpleLazyObject
+    if User.payment_status.is_cached(user):
+        try:
+            payment = user.payment_status
+        except PaymentStatus.DoesNotExist:
+            return NOT_ENTITLED
+        return entitlement_for((payment.status, payment.duration_month, payment.updated_at))
+
+    cache = entitlements_cache()
+    key = entitlement_cache_key(user.pk)
+    entitlement = cache.get(key)
+    if entitlement is None:
+        entitlement = entitlement_for(PaymentStatus.objects.filter(user_id=user.pk).values_list(
+            'status', 'duration_month', 'updated_at').first())
+        timeout = getattr(settings, 'ENTITLEMENTS_CACHE_TIMEOUT', 300)
+        if entitlement.expires_at is not None:
+            # never serve a paid status past its expiry
+            timeout = max(0, min(timeout, int((entitlement.expires_at - timezone.now()).total_seconds())))
+        cache.set(key, tuple(entitlement), timeout)
+    else:
+        entitlement = Entitlement(*entitlement)
+    return entitlement
+
+
+def invalidate_entitlement(user_id):
+    entitlements_cache().delete(entitlement_cache_key(user_id))
+
+
+@receiver(post_save, sender=PaymentStatus)
+@receiver(post_delete, sender=PaymentStatus)
+def payment_status_changed_handler(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_entitlement(user_id))
+
+
+def paid_required(view=None, methods=None, redirect_url='u_dashboard:uhome'):
+    '''
+    @paid_required or @paid_required(methods=['POST'])
+    Redirect users without an active payment (to the dashboard, with a
+    warning) before the view runs. Only `methods` are checked when given.
+    '''
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                entitlement = getattr(request, 'entitlement', None)
+                if entitlement is None:
+                    entitlement = get_entitlement(request.user)
+                if not entitlement.active:
+                    messages.warning(request, PAYMENT_REQUIRED_MESSAGE)
+                    return HttpResponseRedirect(reverse(redirect_url))
+            return view_func(request, *args, **kwargs)
+        return wrapper
+
+    if view is not None:
+        return decorator(view)
+    return decorator
+
+
+class EntitlementMiddleware:
+    '''
+    Sets `request.entitlement`, computed on first use.
+    Place it after AuthenticationMiddleware.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.entitlement = SimpleLazyObject(lambda: get_entitlement(request.user))
+        return self.get_response(request)
@@ -0,0 +1,64 @@
+# Generated by Django 3.2 on 2026-10-18 09:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+ROLES = ('students', 'teachers', 'controller', 'employees', 'guardians')
+
+
+def build_memberships(apps, schema_editor):
+    InstituteGroups = apps.get_model('institude', 'InstituteGroups')
+    InstituteMembership = apps.get_model('institude', 'InstituteMembership')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Through = User.groups.through
+    roles = {}
+    for group_id, institute_id, name in InstituteGroups.objects.values_list(
+            'pk', 'institutes_id', 'name'):
+        role = name.rsplit('_', 1)[-1]
+        if role in ROLES:
+            roles[group_id] = (institute_id, role)
+    memberships = [
+        InstituteMembership(
+            user_id=user_id, group_id=group_id,
+            institute_id=roles[group_id][0], role=roles[group_id][1],
+        )
+        for user_id, group_id in Through.objects.filter(
+            group_id__in=roles).values_list('user_id', 'group_id').iterator()
+    ]
+    InstituteMembership.objects.bulk_create(memberships, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('institude', '0005_institutegroups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstituteMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('students', 'Students'), ('teachers', 'Teachers'), ('controller', 'Controller'), ('employees', 'Employees'), ('guardians', 'Guardians')], max_length=20)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='institude.institutegroups')),
+                ('institute', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='institude.institude')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='institute_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='institutemembership',
+            index=models.Index(fields=['user', 'institute', 'role'], name='institude_membership_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='institutemembership',
+            index=models.Index(fields=['institute', 'role'], name='institude_membership_role_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='institutemembership',
+            constraint=models.UniqueConstraint(fields=('user', 'group'), name='unique_institute_membership'),
+        ),
+        migrations.RunPython(build_memberships, migrations.RunPython.noop),
+    ]
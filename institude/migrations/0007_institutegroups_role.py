@@ -0,0 +1,46 @@
+# Generated by Django 3.2 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+ROLES = ('students', 'teachers', 'controller', 'employees', 'guardians')
+
+
+def set_roles(apps, schema_editor):
+    """
+    Derive `role` from the "<institute name>_<institute id>_<role>" group names
+    and switch to the stable "institute_<institute id>_<role>" names.
+    """
+    InstituteGroups = apps.get_model('institude', 'InstituteGroups')
+    seen = set()
+    groups = []
+    for group in InstituteGroups.objects.order_by('pk'):
+        role = group.name.rsplit('_', 1)[-1]
+        if role not in ROLES or (group.institutes_id, role) in seen:
+            continue
+        seen.add((group.institutes_id, role))
+        group.role = role
+        group.name = 'institute_%s_%s' % (group.institutes_id, role)
+        groups.append(group)
+    for group in groups:
+        group.save(update_fields=['name', 'role'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('institude', '0006_institutemembership'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='institutegroups',
+            name='role',
+            field=models.CharField(blank=True, choices=[('students', 'Students'), ('teachers', 'Teachers'), ('controller', 'Controller'), ('employees', 'Employees'), ('guardians', 'Guardians')], max_length=20, null=True),
+        ),
+        migrations.RunPython(set_roles, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='institutegroups',
+            constraint=models.UniqueConstraint(fields=('institutes', 'role'), name='unique_institute_group_role'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-18 09:31
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('institude', '0007_institutegroups_role'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='institude',
+            name='cover',
+            field=models.ImageField(blank=True, default='istitude/cover.jpg', null=True, storage=core.storage.media_storage, upload_to='institude/cover'),
+        ),
+        migrations.AlterField(
+            model_name='institude',
+            name='logo',
+            field=models.ImageField(blank=True, default='istitude/default.jpg', null=True, storage=core.storage.media_storage, upload_to='institude/logo'),
+        ),
+        migrations.AlterField(
+            model_name='institude',
+            name='sliders',
+            field=models.ImageField(blank=True, default='istitude/sliders.jpg', null=True, storage=core.storage.media_storage, upload_to='institude/sliders'),
+        ),
+    ]
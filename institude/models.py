@@ -1,11 +1,14 @@
 from django.contrib.auth.models import Group, ContentType, Permission
 from django.contrib.postgres.fields.array import ArrayField
-from django.db import models
+from django.db import models, router
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.db.models.deletion import SET_NULL
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import Group
+
+from core.storage import media_storage
+
 User = get_user_model()
 
 class PaymentStatus(models.Model):
@@ -22,6 +25,19 @@ class PaymentStatus(models.Model):
         return str(self.user)
 
 from accounts.models import Address
+
+
+class InstituteRole(models.TextChoices):
+    """
+    Role of the five groups every institute has.
+    """
+    STUDENTS = 'students', 'Students'
+    TEACHERS = 'teachers', 'Teachers'
+    CONTROLLER = 'controller', 'Controller'
+    EMPLOYEES = 'employees', 'Employees'
+    GUARDIANS = 'guardians', 'Guardians'
+
+
 class Institude(models.Model):
     CATEGORY=(
         ('play', 'play'),
@@ -48,9 +64,9 @@ class Institude(models.Model):
     contact_emails = models.EmailField()
     contact_others = models.CharField(max_length=100)
     description = models.TextField()
-    logo = models.ImageField(upload_to='institude/logo', default= 'istitude/default.jpg', blank= True, null = True)
-    cover = models.ImageField(upload_to='institude/cover', default= 'istitude/cover.jpg', blank= True, null = True)
-    sliders = models.ImageField(upload_to='institude/sliders', default= 'istitude/sliders.jpg', blank= True, null = True)
+    logo = models.ImageField(upload_to='institude/logo', storage=media_storage, default= 'istitude/default.jpg', blank= True, null = True)
+    cover = models.ImageField(upload_to='institude/cover', storage=media_storage, default= 'istitude/cover.jpg', blank= True, null = True)
+    sliders = models.ImageField(upload_to='institude/sliders', storage=media_storage, default= 'istitude/sliders.jpg', blank= True, null = True)
     # sliders = ArrayField(models.ImageField(upload_to='institude/slider'), blank=True)
     established_date = models.DateField()
     # teachers = models.ManyToManyField(User, related_name="teachers_of", blank=True)
@@ -60,40 +76,16 @@ class Institude(models.Model):
     # controllers = models.ManyToManyField(User, related_name="controllers_of", blank=True)
     # groups = models.ManyToManyField(User, related_name="groups_of", blank=True) 
 
-    __original_name = None
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.__original_name = self.name
-
     def __str__(self):
         return str(self.name)
 
     def save(self, *args, **kwargs):
+        created = self._state.adding
         super(Institude, self).save(*args, **kwargs)
-        if self.name == self.__original_name:
-            pass
-        if InstituteGroups.objects.filter(institutes = self).count() < 5:
-            InstituteGroups.objects.get_or_create(name=str(self.name)+"_"+str(self.id)+"_students", institutes = self)
-            InstituteGroups.objects.get_or_create(name=str(self.name)+"_"+str(self.id)+"_teachers", institutes = self)
-            InstituteGroups.objects.get_or_create(name=str(self.name)+"_"+str(self.id)+"_controller", institutes = self)
-            InstituteGroups.objects.get_or_create(name=str(self.name)+"_"+str(self.id)+"_employees", institutes = self)
-            InstituteGroups.objects.get_or_create(name=str(self.name)+"_"+str(self.id)+"_guardians", institutes = self)
-        elif self.name != self.__original_name:
-            st_g = InstituteGroups.objects.get(name=str(self.__original_name)+"_"+str(self.id)+"_students", institutes = self)
-            st_g.name = str(self.name)+"_"+str(self.id)+"_students"
-            st_g.save()
-            teacher_g = InstituteGroups.objects.get(name=str(self.__original_name)+"_"+str(self.id)+"_teachers", institutes = self)
-            teacher_g.name = str(self.name)+"_"+str(self.id)+"_teachers"
-            teacher_g.save()
-            controller = InstituteGroups.objects.get(name=str(self.__original_name)+"_"+str(self.id)+"_controller", institutes = self)
-            controller.name = str(self.name)+"_"+str(self.id)+"_controller"
-            controller.save()
-            employees = InstituteGroups.objects.get(name=str(self.__original_name)+"_"+str(self.id)+"_employees", institutes = self)
-            employees.name = str(self.name)+"_"+str(self.id)+"_employees"
-            employees.save()
-            guardians = InstituteGroups.objects.get(name=str(self.__original_name)+"_"+str(self.id)+"_guardians", institutes = self)
-            guardians.name = str(self.name)+"_"+str(self.id)+"_guardians"
-            guardians.save()
+        if created:
+            # group names don't depend on the institute name,
+            # so a rename touches no group rows
+            self._role_groups = InstituteGroups.create_for(self)
         # Create contenttype and permissions, replace app_label and model to fit your needs
         # content_type = ContentType.objects.get(app_label='institude', model='Institude')
         
@@ -107,12 +99,24 @@ class Institude(models.Model):
         #                                     name='can edit eiin of institute',
         #                                     content_type=content_type)
 
+    def role_group(self, role):
+        """
+        InstituteGroups of the given `InstituteRole` (indexed by institutes+role).
+        """
+        role_groups = getattr(self, '_role_groups', None)
+        if role_groups is None:
+            role_groups = self._role_groups = {}
+        if role not in role_groups:
+            role_groups[role] = self.grps.get(role=role)
+        return role_groups[role]
+
 
 class InstituteGroupsManager(models.Manager):
     def get_query_set(self):
         return super(InstituteGroupsManager, self).get_query_set().filter(student__enrolled=True).distinct()
 class InstituteGroups(Group):
     institutes = models.ForeignKey(Institude, on_delete=models.CASCADE, related_name='grps')
+    role = models.CharField(max_length=20, choices=InstituteRole.choices, null=True, blank=True)
 
     objects = models.Manager()
     has_students = InstituteGroupsManager()
@@ -120,6 +124,139 @@ class InstituteGroups(Group):
     class Meta:
         verbose_name_plural = "Institute_Groups"
         ordering = ['name']
+        constraints = [
+            # one group per role and institute, also the index of role lookups
+            models.UniqueConstraint(fields=['institutes', 'role'], name='unique_institute_group_role'),
+        ]
+
+    def __str__(self):
+        return self.display_name
 
     def __unicode__(self):
         return self.name
+
+    @property
+    def display_name(self):
+        # derived from the current institute name, the stored group name never changes.
+        # Reads `institutes`: list groups with select_related('institutes')
+        # (or from institute.grps, which sets it)
+        if self.role is None:
+            return self.name
+        return "%s_%s" % (self.institutes.name, self.role)
+
+    @staticmethod
+    def group_name(institute_id, role):
+        # Group.name is unique, so it is built from ids only
+        return "institute_%s_%s" % (institute_id, role)
+
+    @classmethod
+    def create_for(cls, institute):
+        """
+        Create the five role groups of a new institute with one INSERT
+        into auth_group and one into this table.
+        returns: `dict` of role -> InstituteGroups
+        """
+        return cls.bulk_create_for([institute])[institute.pk]
+
+    @classmethod
+    def bulk_create_for(cls, institutes):
+        """
+        Create the five role groups of every institute of `institutes`
+        (i.e. made by Institude.objects.bulk_create(), which skips save())
+        with one INSERT into auth_group and one into this table.
+        returns: `dict` of institute id -> role -> InstituteGroups
+        """
+        pairs = [(institute, role) for institute in institutes for role in InstituteRole.values]
+        groups = Group.objects.bulk_create([
+            Group(name=cls.group_name(institute.pk, role)) for institute, role in pairs
+        ])
+        created = {}
+        for group, (institute, role) in zip(groups, pairs):
+            obj = cls(group_ptr=group, name=group.name, institutes=institute, role=role)
+            obj.pk = group.pk
+            created.setdefault(institute.pk, {})[role] = obj
+        objs = [obj for role_groups in created.values() for obj in role_groups.values()]
+        # bulk_create() doesn't support multi-table inheritance,
+        # insert the child rows in one statement the way save_base() does.
+        # Manager._insert() is private API, checked against Django 3.2
+        # (requirements.txt): review it when upgrading Django
+        using = router.db_for_write(cls)
+        if objs:
+            cls._base_manager._insert(objs, fields=cls._meta.local_concrete_fields, using=using)
+        for obj in objs:
+            obj._state.adding = False
+            obj._state.db = using
+        return created
+
+
+class InstituteMembership(models.Model):
+    """
+    Precomputed (user, institute, role) index of InstituteGroups membership.
+    It is kept in sync with User.groups by `institute_membership_handler`
+    and read by `institude.backends.InstitutePermissionBackend`.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='institute_memberships')
+    institute = models.ForeignKey(Institude, on_delete=models.CASCADE, related_name='memberships')
+    group = models.ForeignKey(InstituteGroups, on_delete=models.CASCADE, related_name='memberships')
+    role = models.CharField(max_length=20, choices=InstituteRole.choices)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'group'], name='unique_institute_membership'),
+        ]
+        indexes = [
+            # has_perm(user, perm, obj=institute)
+            models.Index(fields=['user', 'institute', 'role'], name='institude_membership_user_idx'),
+            # with_perm(perm, obj=institute)
+            models.Index(fields=['institute', 'role'], name='institude_membership_role_idx'),
+        ]
+
+    def __str__(self):
+        return '%s: %s of %s' % (self.user_id, self.role, self.institute_id)
+
+    @classmethod
+    def add(cls, user_ids, groups):
+        cls.objects.bulk_create([
+            cls(user_id=user_id, institute_id=group.institutes_id, group=group, role=group.role)
+            for group in groups if group.role
+            for user_id in user_ids
+        ], ignore_conflicts=True)
+
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from accounts.backends import invalidate_all_permissions
+
+
+@receiver(post_save, sender=InstituteGroups)
+@receiver(post_delete, sender=InstituteGroups)
+def institute_groups_changed_handler(sender, created=False, **kwargs):
+    # a brand-new group has no members, so no cached permission set is stale
+    if not created:
+        transaction.on_commit(invalidate_all_permissions)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def institute_membership_handler(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep InstituteMembership in sync with user.groups / group.user_set changes.
+    """
+    if action == 'post_add':
+        if reverse:
+            groups = InstituteGroups.objects.filter(pk=instance.pk)
+            user_ids = pk_set
+        else:
+            groups = InstituteGroups.objects.filter(pk__in=pk_set)
+            user_ids = [instance.pk]
+        InstituteMembership.add(user_ids, groups)
+    elif action == 'post_remove':
+        if reverse:
+            InstituteMembership.objects.filter(group_id=instance.pk, user_id__in=pk_set).delete()
+        else:
+            InstituteMembership.objects.filter(user_id=instance.pk, group_id__in=pk_set).delete()
+    elif action == 'post_clear':
+        if reverse:
+            InstituteMembership.objects.filter(group_id=instance.pk).delete()
+        else:
+            InstituteMembership.objects.filter(user_id=instance.pk).delete()
@@ -1,3 +1,87 @@
+import datetime
+
+from django.contrib.auth.models import Permission
+from django.contrib.messages import get_messages
 from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import User
+from institude.entitlements import PAYMENT_REQUIRED_MESSAGE
+from institude.models import Institude, InstituteRole, PaymentStatus
+
+
+class EntitlementRequestTests(TestCase):
+    '''
+    request.entitlement and @paid_required with a logged-in request.user,
+    which is a SimpleLazyObject.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('payer', 'payer@example.com', 'pass')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create_institute(self):
+        return self.client.post(reverse('institute_create'), {
+            'name': 'alpha', 'category': 'College', 'contact_phones': '0',
+            'contact_emails': 'alpha@example.com', 'contact_others': '-',
+            'description': '-', 'established_date': '2000-01-01',
+        }, HTTP_REFERER=reverse('u_dashboard:uhome'))
+
+    def test_dashboard_entitlement(self):
+        PaymentStatus.objects.create(user=self.user, amount=100, status=True)
+        response = self.client.get(reverse('u_dashboard:uhome'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIs(response.context['status'], True)
+
+    def test_dashboard_without_payment(self):
+        response = self.client.get(reverse('u_dashboard:uhome'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIs(response.context['status'], False)
+
+    def test_paid_required_redirects_unpaid_post(self):
+        response = self.create_institute()
+        self.assertRedirects(response, reverse('u_dashboard:uhome'), fetch_redirect_response=False)
+        self.assertIn(PAYMENT_REQUIRED_MESSAGE, [str(m) for m in get_messages(response.wsgi_request)])
+        self.assertFalse(Institude.objects.exists())
+
+    def test_paid_required_lets_paid_post_through(self):
+        PaymentStatus.objects.create(user=self.user, amount=100, status=True)
+        response = self.create_institute()
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Institude.objects.filter(owner=self.user, name='alpha').exists())
+
+    def test_expired_payment(self):
+        PaymentStatus.objects.create(user=self.user, amount=100, status=True, duration_month=1)
+        PaymentStatus.objects.filter(user=self.user).update(
+            updated_at=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc))
+        response = self.client.get(reverse('u_dashboard:uhome'))
+        self.assertIs(response.context['status'], False)
+
+
+class WithPermTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.institute = Institude.objects.create(
+            owner=cls.owner, name='alpha', category='College', contact_phones='0',
+            contact_emails='alpha@example.com', contact_others='-', description='-',
+            established_date=datetime.date(2000, 1, 1),
+        )
+        cls.teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pass')
+        cls.institute.role_group(InstituteRole.TEACHERS).user_set.add(cls.teacher)
+        cls.staff = User.objects.create_user('staff', 'staff@example.com', 'pass')
+        cls.staff.user_permissions.add(Permission.objects.get(codename='change_institutegroups'))
+
+    def test_model_permission_without_backend(self):
+        self.assertEqual(
+            list(User.objects.with_perm('institude.change_institutegroups', include_superusers=False)),
+            [self.staff])
 
-# Create your tests here.
+    def test_object_permission_without_backend(self):
+        self.assertEqual(
+            set(User.objects.with_perm('institude.change_institutegroups', obj=self.institute)),
+            {self.owner, self.teacher})
@@ -3,24 +3,13 @@ from django.shortcuts import render, HttpResponseRedirect, reverse
 from .forms import InstituteForm
 from .models import *
 from django.contrib import messages
+from .entitlements import paid_required
 # Create your views here.
 
+@paid_required(methods=['POST'])
 def institute_create(request):
     if request.method=="POST":
         form = InstituteForm(request.POST, request.FILES)
-        try:
-            pay = request.user.payment_status
-            if pay.status:
-                status = True
-            else:
-                status = False
-        except Exception as e:
-            print(e)
-            status = None
-        if not status:
-            messages.warning(request, "You don't have permissions! Pay first")
-            # messages.info(request, "You are Logged out !")
-            return HttpResponseRedirect(reverse('u_dashboard:uhome'))
         if form.errors:
             for field in form:
                 for error in field.errors:
@@ -29,8 +18,7 @@ def institute_create(request):
             obj = form.save(commit=False)
             obj.owner = request.user
             obj.save()
-            grp = Group.objects.get(name=str(obj.name)+"_"+str(obj.id)+"_controller")
-            grp.user_set.add(request.user)
+            obj.role_group(InstituteRole.CONTROLLER).user_set.add(request.user)
             messages.success(request, "Successfully Created an Institute!")
             return HttpResponseRedirect(request.META.get('HTTP_REFERER'))
     context ={
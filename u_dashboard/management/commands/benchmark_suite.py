@@ -0,0 +1,183 @@
+import itertools
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from accounts.models import User
+from accounts.registry import user_types
+from institude.models import Institude, InstituteRole
+
+from .seed_load import SEED_PASSWORD
+
+ADMIN_CHANGELISTS = (
+    'accounts_user', 'accounts_profile', 'accounts_teachermore',
+    'institude_institude', 'institude_institutemembership',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Time signup, login, dashboard, groups_list, add_user, the proxy managers '
+        'and admin changelists against the data of `seed_load`, and print the '
+        'results as JSON (--compare reports regressions against an earlier run). '
+        'Everything runs in a transaction rolled back at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='seed', help='`seed_load --prefix` of the data')
+        parser.add_argument('--repeat', type=int, default=20, help='timed runs per scenario')
+        parser.add_argument('--output', help='write the JSON results to this file')
+        parser.add_argument('--compare', help='JSON results of an earlier run')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='median slowdown reported as a regression by --compare (0.2: 20%%)')
+
+    def handle(self, *args, **options):
+        self.prefix = options['prefix']
+        self.repeat = options['repeat']
+        owner = (
+            User.objects.filter(username__startswith='%s_owner_' % self.prefix, payment_status__status=True)
+            .order_by('pk').first()
+        )
+        if owner is None:
+            raise CommandError('no data, run `manage.py seed_load --prefix %s` first' % self.prefix)
+        self.institute = Institude.objects.filter(owner=owner).order_by('pk').first()
+        self.owner = owner
+
+        results = {}
+        # the test client's host
+        with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            for name, scenario in self.scenarios():
+                results[name] = self.measure(scenario)
+                self.stderr.write('%-32s median %8.2f ms  p95 %8.2f ms  %3d queries' % (
+                    name, results[name]['median_ms'], results[name]['p95_ms'], results[name]['queries']))
+            transaction.set_rollback(True)
+
+        report = {
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connections[DEFAULT_DB_ALIAS].vendor,
+                'repeat': self.repeat,
+            },
+            'data': {
+                'users': User.objects.filter(username__startswith=self.prefix).count(),
+                'institutes': Institude.objects.filter(name__startswith=self.prefix).count(),
+            },
+            'results': results,
+        }
+        if options['compare']:
+            report['regressions'] = self.compare(results, options['compare'], options['tolerance'])
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
+        if report.get('regressions'):
+            raise CommandError('%s regression(s): %s' % (
+                len(report['regressions']), ', '.join(report['regressions'])))
+
+    def measure(self, scenario):
+        # first run warms caches and connections, not timed
+        scenario()
+        timings = []
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as context:
+            for _ in range(self.repeat):
+                started = time.perf_counter()
+                scenario()
+                timings.append((time.perf_counter() - started) * 1000)
+        return {
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(sorted(timings)[max(int(len(timings) * 0.95) - 1, 0)], 3),
+            'min_ms': round(min(timings), 3),
+            'max_ms': round(max(timings), 3),
+            'queries': len(context.captured_queries) // self.repeat,
+        }
+
+    def client(self, user=None):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        return client
+
+    def get(self, client, url, data=None, status=200):
+        def scenario():
+            response = client.get(url, data)
+            if response.status_code != status:
+                raise CommandError('GET %s: %s' % (url, response.status_code))
+        return scenario
+
+    def scenarios(self):
+        owner_client = self.client(self.owner)
+        students = self.institute.role_group(InstituteRole.STUDENTS)
+        signups = itertools.count()
+
+        def signup():
+            number = next(signups)
+            username = '%s_signup_%s' % (self.prefix, number)
+            response = Client().post(reverse('accounts:signup'), {
+                'username': username, 'email': '%s@example.com' % username, 'sex': 'M',
+                'password1': SEED_PASSWORD, 'password2': SEED_PASSWORD,
+            })
+            if response.status_code != 302:
+                raise CommandError('signup failed: %s' % response.status_code)
+
+        def login():
+            response = Client().post(reverse('accounts:login'), {
+                'username': self.owner.username, 'password': SEED_PASSWORD})
+            if response.status_code != 302:
+                raise CommandError('login failed, was the owner created by seed_load?')
+
+        candidates = list(
+            User.objects.filter(username__startswith='%s_student_' % self.prefix)
+            .exclude(groups=students).values_list('username', flat=True)[:self.repeat + 1])
+
+        def add_user():
+            # one new member per run, then an already added one
+            username = candidates.pop() if candidates else self.owner.username
+            response = owner_client.post(
+                reverse('u_dashboard:add_user', args=[students.pk]), {'identifiers': username},
+                HTTP_REFERER=reverse('u_dashboard:groups_list', args=[self.institute.pk]))
+            if response.status_code != 302:
+                raise CommandError('add_user failed: %s' % response.status_code)
+
+        yield 'signup', signup
+        yield 'login', login
+        yield 'dashboard', self.get(owner_client, reverse('u_dashboard:uhome'))
+        yield 'groups_list', self.get(owner_client, reverse('u_dashboard:groups_list', args=[self.institute.pk]))
+        yield 'add_user', add_user
+        for user_type in user_types:
+            manager = user_type.proxy_model.objects
+            name = user_type.proxy_model.__name__.lower()
+            yield 'proxy.%s.count' % name, manager.count
+            yield 'proxy.%s.page' % name, lambda manager=manager: list(manager.order_by('pk')[:100])
+
+        superuser = User.objects.filter(is_superuser=True).first() or User.objects.create_superuser(
+            '%s_admin' % self.prefix, '%s_admin@example.com' % self.prefix, SEED_PASSWORD)
+        admin_client = self.client(superuser)
+        for changelist in ADMIN_CHANGELISTS:
+            yield 'admin.%s' % changelist, self.get(admin_client, reverse('admin:%s_changelist' % changelist))
+
+    def compare(self, results, path, tolerance):
+        with open(path) as file:
+            baseline = json.load(file)['results']
+        regressions = {}
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            slower = result['median_ms'] > before['median_ms'] * (1 + tolerance)
+            more_queries = result['queries'] > before['queries']
+            if slower or more_queries:
+                regressions[name] = {
+                    'median_ms': [before['median_ms'], result['median_ms']],
+                    'queries': [before['queries'], result['queries']],
+                }
+        return regressions
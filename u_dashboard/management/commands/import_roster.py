@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from institude.models import InstituteGroups
+from u_dashboard.roster import RosterImport
+
+
+class Command(BaseCommand):
+    help = (
+        'Import a CSV/XLSX roster (username, email, phone, sex, first_name, '
+        'last_name, password columns) into an institute group.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='roster .csv or .xlsx file')
+        parser.add_argument('--group', type=int, required=True, help='InstituteGroups id')
+        parser.add_argument('--type', choices=[t.name.lower() for t in User.TypesChoices],
+                            help='user type of the imported users, i.e. student')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None,
+                            help='password hashing processes (default: CPU count)')
+        parser.add_argument('--resume', action='store_true',
+                            help='continue after the last row committed by an earlier run of this file')
+        parser.add_argument('--report', help='CSV file receiving the rejected rows')
+
+    def handle(self, *args, **options):
+        try:
+            group = InstituteGroups.objects.get(pk=options['group'])
+        except InstituteGroups.DoesNotExist:
+            raise CommandError('InstituteGroups %s does not exist' % options['group'])
+        user_type = User.TypesChoices[options['type'].upper()] if options['type'] else None
+        roster_import = RosterImport(
+            group,
+            user_type=user_type,
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            resume=options['resume'],
+            report_path=options['report'],
+        )
+        try:
+            stats = roster_import.run(options['path'])
+        except (OSError, ImportError) as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS(
+            'created {created}, failed {failed}, skipped {skipped}'.format(**stats)))
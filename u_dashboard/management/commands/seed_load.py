@@ -0,0 +1,111 @@
+import datetime
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import User
+from accounts.registry import user_types
+from institude.models import Institude, InstituteGroups, InstituteRole, PaymentStatus
+
+# group of an institute receiving the users of each type
+TYPE_ROLES = {
+    User.TypesChoices.CONTROLLER: InstituteRole.CONTROLLER,
+    User.TypesChoices.TEACHER: InstituteRole.TEACHERS,
+    User.TypesChoices.STUDENT: InstituteRole.STUDENTS,
+    User.TypesChoices.GUARDIAN: InstituteRole.GUARDIANS,
+    User.TypesChoices.EMPLOYEE: InstituteRole.EMPLOYEES,
+}
+FIRST_NAMES = ('anna', 'john', 'maria', 'rahim', 'karim', 'fatema', 'sara', 'omar', 'lina', 'nadia')
+LAST_NAMES = ('smith', 'hossain', 'rahman', 'khan', 'ahmed', 'garcia', 'islam', 'miller', 'chowdhury')
+SEED_PASSWORD = 'seed-load-password'
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic load data with bulk inserts: owners with PaymentStatus, '
+        '`--institutes` institutes with their five groups, and `--users` users of every '
+        'user type (Profile and <User Type>More included) spread over those groups. '
+        'Usernames start with `--prefix`, every password is "%s".' % SEED_PASSWORD
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--institutes', type=int, default=10)
+        parser.add_argument('--users', type=int, default=100, help='users per user type')
+        parser.add_argument('--paid', type=float, default=0.8,
+                            help='share of owners with an active PaymentStatus')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--prefix', default='seed', help='username prefix, must not be in use')
+        parser.add_argument('--seed', type=int, default=0, help='random seed, for reproducible data')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        self.batch_size = options['batch_size']
+        # one hash for every user, hashing is what would take the time otherwise
+        self.password = make_password(SEED_PASSWORD)
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            owners = self.create_users(User, 'owner', options['institutes'])
+            PaymentStatus.objects.bulk_create([
+                PaymentStatus(user=owner, amount=1000, duration_month=12,
+                              status=self.rng.random() < options['paid'])
+                for owner in owners
+            ], batch_size=self.batch_size)
+            institutes = self.create_institutes(owners)
+            self.stdout.write('%s institutes, %s groups' % (len(institutes), len(institutes) * len(InstituteRole)))
+
+            for user_type in user_types:
+                users = self.create_users(
+                    user_type.proxy_model, user_type.proxy_model.__name__.lower(), options['users'])
+                self.add_to_groups(users, institutes, TYPE_ROLES[user_type.value])
+                self.stdout.write('%s %s users' % (len(users), user_type.proxy_model.__name__))
+
+        self.stdout.write(self.style.SUCCESS('seeded in %.1f s' % (time.perf_counter() - started)))
+
+    def create_users(self, model, kind, count):
+        rows = []
+        for number in range(count):
+            username = '%s_%s_%s' % (self.prefix, kind, number)
+            rows.append({
+                'username': username,
+                'email': '%s@example.com' % username,
+                'first_name': self.rng.choice(FIRST_NAMES),
+                'last_name': self.rng.choice(LAST_NAMES),
+                'password': self.password,
+            })
+        return model.objects.bulk_create_typed(rows, batch_size=self.batch_size, hashed_passwords=True)
+
+    def create_institutes(self, owners):
+        institutes = Institude.objects.bulk_create([
+            Institude(
+                owner=owner,
+                name='%s institute %s' % (self.prefix, number),
+                category=self.rng.choice(Institude.CATEGORY)[0],
+                contact_phones='0',
+                contact_emails='%s@example.com' % owner.username,
+                contact_others='-',
+                description='-',
+                established_date=datetime.date(self.rng.randint(1950, 2020), 1, 1),
+            )
+            for number, owner in enumerate(owners)
+        ], batch_size=self.batch_size)
+        # bulk_create() skips Institude.save(), which creates the groups
+        for start in range(0, len(institutes), self.batch_size):
+            role_groups = InstituteGroups.bulk_create_for(institutes[start:start + self.batch_size])
+            for institute in institutes[start:start + self.batch_size]:
+                institute._role_groups = role_groups[institute.pk]
+        return institutes
+
+    def add_to_groups(self, users, institutes, role):
+        if not institutes:
+            return
+        members = {}
+        for user in users:
+            members.setdefault(self.rng.choice(institutes), []).append(user.pk)
+        for institute, user_ids in members.items():
+            # through the related manager: InstituteMembership follows (m2m_changed)
+            institute.role_group(role).user_set.add(*user_ids)
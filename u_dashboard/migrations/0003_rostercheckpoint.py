@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-18 18:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('institude', '0008_institude_media_storage'),
+        ('u_dashboard', '0002_member_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RosterCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=500)),
+                ('row', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='institude.institutegroups')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='rostercheckpoint',
+            constraint=models.UniqueConstraint(fields=('source', 'group'), name='unique_roster_checkpoint'),
+        ),
+    ]
@@ -19,3 +19,22 @@ class DomainAware(models.Model):
 
 class Member(DomainAware):
    name = models.CharField(max_length=40, null=True, blank=True)
+
+
+class RosterCheckpoint(models.Model):
+    """
+    Last row of a roster file committed into a group by u_dashboard.roster.RosterImport,
+    updated in the transaction of each batch.
+    """
+    source = models.CharField(max_length=500)
+    group = models.ForeignKey('institude.InstituteGroups', on_delete=models.CASCADE, related_name='+')
+    row = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'group'], name='unique_roster_checkpoint'),
+        ]
+
+    def __str__(self):
+        return '%s -> %s: row %s' % (self.source, self.group_id, self.row)
@@ -0,0 +1,195 @@
+# u_dashboard.roster.py
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.forms import SignUpForm
+from accounts.models import User
+from accounts.registry import user_types
+
+from .models import RosterCheckpoint
+
+# columns read from the roster file, `password` is required like in SignUpForm
+ROSTER_COLUMNS = ('username', 'email', 'phone', 'sex', 'first_name', 'last_name', 'password')
+
+
+class RosterRowForm(SignUpForm):
+    """
+    SignUpForm rules (username validator, password validators, phone, sex)
+    for one roster row, the email is required.
+    """
+
+    class Meta(SignUpForm.Meta):
+        fields = ('username', 'email', 'phone', 'sex', 'first_name', 'last_name')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # User.email is unique and not nullable: a second blank email
+        # would fail the INSERT of its whole batch
+        self.fields['email'].required = True
+
+    def validate_unique(self):
+        """
+        Username, email and phone are checked by RosterImport.drop_duplicates,
+        with one query per batch instead of three per row.
+        """
+
+
+def iter_rows(path):
+    """
+    Yield (row number, `dict`) pairs of a CSV or XLSX roster one row at a time,
+    the file is never loaded as a whole. Row numbers start at 2 (after the header).
+    """
+    if path.lower().endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportError('openpyxl is required to import .xlsx rosters')
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell or '').strip().lower() for cell in next(rows, ())]
+            for number, values in enumerate(rows, start=2):
+                yield number, {
+                    key: '' if value is None else str(value).strip()
+                    for key, value in zip(header, values)
+                }
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as roster:
+            reader = csv.DictReader(roster)
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or ()]
+            for number, row in enumerate(reader, start=2):
+                yield number, {key: (value or '').strip() for key, value in row.items() if key}
+
+
+class RosterImport:
+    '''
+    RosterImport(group, [user_type=None, batch_size=500, workers=None, resume=False, report_path=None])
+    Import a CSV/XLSX roster into an InstituteGroups:
+        - rows are streamed and validated like SignUpForm
+        - passwords of a batch are hashed in a process pool
+        - every batch is committed with User.objects.bulk_create_typed and
+          one group.user_set.add, in its own transaction
+        - the last committed row is recorded in RosterCheckpoint (per file
+          and group) by the transaction of its batch, a rerun with `resume`
+          continues after it
+        - invalid rows are appended to the `report_path` CSV
+    '''
+
+    def __init__(self, group, user_type=None, batch_size=500, workers=None,
+                 resume=False, report_path=None):
+        self.group = group
+        self.manager = user_types[user_type].proxy_model.objects if user_type else User.objects
+        self.batch_size = batch_size
+        self.workers = workers
+        self.resume = resume
+        self.report_path = report_path
+        self.stats = {'created': 0, 'failed': 0, 'skipped': 0}
+
+    def run(self, path):
+        start_after = self.read_checkpoint(path)
+        report = open(self.report_path, 'a', newline='') if self.report_path else None
+        self.report = csv.writer(report) if report else None
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup) as pool:
+                self.pool = pool
+                batch = []
+                number = start_after
+                for number, row in iter_rows(path):
+                    if number <= start_after:
+                        self.stats['skipped'] += 1
+                        continue
+                    fields = self.validate(number, row)
+                    if fields is not None:
+                        batch.append((number, fields))
+                    if len(batch) >= self.batch_size:
+                        self.commit(path, batch, number)
+                        batch = []
+                if batch:
+                    self.commit(path, batch, number)
+                elif number > start_after:
+                    self.write_checkpoint(path, number)
+        finally:
+            if report:
+                report.close()
+        return self.stats
+
+    def validate(self, number, row):
+        password = row.get('password', '')
+        data = {key: row.get(key, '') for key in ROSTER_COLUMNS if key != 'password'}
+        data.update(password1=password, password2=password)
+        if not data['sex']:
+            data['sex'] = User.SexChoices.PRIVATE
+        form = RosterRowForm(data=data)
+        if not form.is_valid():
+            self.fail(number, row, '; '.join(
+                '%s: %s' % (field, ' '.join(errors)) for field, errors in form.errors.items()))
+            return None
+        fields = {key: form.cleaned_data.get(key) for key in RosterRowForm.Meta.fields}
+        # as stored by bulk_create_typed, for drop_duplicates
+        fields['email'] = User.objects.normalize_email(fields['email'])
+        fields['password'] = password
+        return fields
+
+    def fail(self, number, row, error):
+        self.stats['failed'] += 1
+        if self.report:
+            self.report.writerow([number, row.get('username', ''), error])
+
+    def drop_duplicates(self, batch):
+        """
+        Drop rows clashing with existing users or earlier rows of the batch,
+        with a single query for the whole batch.
+        """
+        usernames = [fields['username'] for _, fields in batch]
+        emails = [fields['email'] for _, fields in batch if fields['email']]
+        phones = [fields['phone'] for _, fields in batch if fields['phone']]
+        taken = set()
+        for values in User.objects.filter(
+                Q(username__in=usernames) | Q(email__in=emails) | Q(phone__in=phones),
+        ).values_list('username', 'email', 'phone'):
+            taken.update(str(value) for value in values if value)
+        unique = []
+        for number, fields in batch:
+            keys = [str(fields[key]) for key in ('username', 'email', 'phone') if fields[key]]
+            clash = [key for key in keys if key in taken]
+            if clash:
+                self.fail(number, fields, 'already exists: %s' % ', '.join(clash))
+                continue
+            taken.update(keys)
+            unique.append((number, fields))
+        return unique
+
+    def commit(self, path, batch, last_number):
+        batch = self.drop_duplicates(batch)
+        passwords = [fields['password'] for _, fields in batch]
+        chunksize = max(1, len(passwords) // ((self.workers or os.cpu_count() or 1) * 4))
+        for (_, fields), hashed in zip(batch, self.pool.map(make_password, passwords, chunksize=chunksize)):
+            fields['password'] = hashed
+        with transaction.atomic():
+            users = self.manager.bulk_create_typed(
+                [fields for _, fields in batch], batch_size=self.batch_size,
+                hashed_passwords=True)
+            if users:
+                self.group.user_set.add(*users)
+            # committed with the batch, or not at all
+            self.write_checkpoint(path, last_number)
+        self.stats['created'] += len(users)
+
+    def read_checkpoint(self, path):
+        if not self.resume:
+            return 0
+        checkpoint = RosterCheckpoint.objects.filter(
+            source=os.path.abspath(path), group=self.group).values_list('row', flat=True).first()
+        return checkpoint or 0
+
+    def write_checkpoint(self, path, number):
+        RosterCheckpoint.objects.update_or_create(
+            source=os.path.abspath(path), group=self.group, defaults={'row': number})
@@ -1,3 +1,233 @@
+import csv
+import datetime
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.db.models.signals import m2m_changed
 from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import Teacher, TeacherMore, User
+from core.history import current_history_user
+from core.testing import QueryBudgetTestCase
+from u_dashboard.models import RosterCheckpoint
+from u_dashboard.roster import RosterImport
+from institude.models import Institude, InstituteMembership, InstituteRole, PaymentStatus
+
+# session, user with payment status, institutes with counts, their groups
+DASHBOARD_QUERY_BUDGET = 4
+
+
+class DashboardQueryBudgetTests(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # dashboard.html lists the institutes (`ins`) to superusers only
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass', is_superuser=True)
+        PaymentStatus.objects.create(user=cls.owner, amount=0, status=True)
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def add_institute(self, name):
+        institute = Institude.objects.create(
+            owner=self.owner, name=name, category='College',
+            contact_phones='0', contact_emails='school@example.com',
+            contact_others='-', description='-',
+            established_date=datetime.date(2000, 1, 1),
+        )
+        member = User.objects.create_user('%s_member' % name, '%s@example.com' % name, 'pass')
+        institute.grps.first().user_set.add(member)
+        return institute
+
+    def get_dashboard(self):
+        return self.client.get(reverse('u_dashboard:uhome'))
+
+    def test_dashboard_within_budget(self):
+        self.add_institute('alpha')
+        with self.assertQueryBudget(DASHBOARD_QUERY_BUDGET):
+            response = self.get_dashboard()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'alpha')
+        self.assertContains(response, '1 members')
+        self.assertEqual(response.context['ins'][0].member_count, 1)
+
+    def test_dashboard_without_payment_status(self):
+        self.owner.payment_status.delete()
+        with self.assertQueryBudget(DASHBOARD_QUERY_BUDGET):
+            response = self.get_dashboard()
+        self.assertFalse(response.context['status'])
+
+    def test_dashboard_queries_do_not_grow_with_institutes(self):
+        self.add_institute('alpha')
+        self.assertConstantQueries(
+            self.get_dashboard,
+            lambda: [self.add_institute(name) for name in ('beta', 'gamma')],
+        )
+
+
+class UserAutocompleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.institute = Institude.objects.create(
+            owner=cls.owner, name='alpha', category='College',
+            contact_phones='0', contact_emails='alpha@example.com',
+            contact_others='-', description='-',
+            established_date=datetime.date(2000, 1, 1),
+        )
+        cls.students = cls.institute.role_group(InstituteRole.STUDENTS)
+        cls.teacher = User.objects.create_user('anna_teacher', 'anna@example.com', 'pass', phone='+8801711111111')
+        cls.institute.role_group(InstituteRole.TEACHERS).user_set.add(cls.teacher)
+        User.objects.create_user('anna_elsewhere', 'anna2@example.com', 'pass')
+
+    def test_members_of_the_institute_only_without_contact_details(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(
+            reverse('u_dashboard:user_autocomplete', args=[self.students.pk]), {'q': 'anna'})
+        self.assertEqual(response.json()['results'], [
+            {'id': self.teacher.pk, 'username': 'anna_teacher', 'name': ''},
+        ])
+
+    def test_group_members_are_not_suggested(self):
+        self.students.user_set.add(self.teacher)
+        self.client.force_login(self.owner)
+        response = self.client.get(
+            reverse('u_dashboard:user_autocomplete', args=[self.students.pk]), {'q': 'anna'})
+        self.assertEqual(response.json()['results'], [])
+
+
+class AddUsersStreamTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.institute = Institude.objects.create(
+            owner=cls.owner, name='alpha', category='College',
+            contact_phones='0', contact_emails='alpha@example.com',
+            contact_others='-', description='-',
+            established_date=datetime.date(2000, 1, 1),
+        )
+        User.objects.create_user('known', 'known@example.com', 'pass')
+
+    def test_report_is_quoted_and_formula_safe(self):
+        self.client.force_login(self.owner)
+        students = self.institute.role_group(InstituteRole.STUDENTS)
+        upload = SimpleUploadedFile('ids.csv', b'known,=HYPERLINK("http://x"),"a,b"\n@SUM(A1)\n')
+        response = self.client.post(
+            reverse('u_dashboard:add_users_stream', args=[students.pk]), {'file': upload})
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertTrue(students.user_set.filter(username='known').exists())
+        self.assertEqual(rows, [
+            ['identifier', 'status'],
+            ["'=HYPERLINK(\"http://x\")", 'unknown'],
+            ['a,b', 'unknown'],
+            ["'@SUM(A1)", 'unknown'],
+            ['# 1 user(s) added'],
+        ])
+
+    def test_members_added_within_the_request(self):
+        added_by = []
+
+        def receiver(action, **kwargs):
+            if action == 'post_add':
+                # what history rows written here would record as history_user
+                added_by.append(current_history_user())
+
+        m2m_changed.connect(receiver, sender=User.groups.through)
+        self.addCleanup(m2m_changed.disconnect, receiver, sender=User.groups.through)
+        self.client.force_login(self.owner)
+        students = self.institute.role_group(InstituteRole.STUDENTS)
+        response = self.client.post(
+            reverse('u_dashboard:add_users_stream', args=[students.pk]),
+            {'file': SimpleUploadedFile('ids.csv', b'known\n')})
+        b''.join(response.streaming_content)
+        self.assertEqual(added_by, [self.owner])
+        self.assertTrue(InstituteMembership.objects.filter(
+            group=students, user__username='known', role=InstituteRole.STUDENTS).exists())
+
+
+class RosterImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.institute = Institude.objects.create(
+            owner=cls.owner, name='alpha', category='College',
+            contact_phones='0', contact_emails='alpha@example.com',
+            contact_others='-', description='-',
+            established_date=datetime.date(2000, 1, 1),
+        )
+
+    def write_roster(self, rows):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'roster.csv')
+        with open(path, 'w', newline='') as roster:
+            writer = csv.writer(roster)
+            writer.writerow(['username', 'email', 'password'])
+            writer.writerows(rows)
+        return path
+
+    def import_roster(self, rows):
+        path = self.write_roster(rows)
+        report_path = os.path.join(os.path.dirname(path), 'report.csv')
+        students = self.institute.role_group(InstituteRole.STUDENTS)
+        stats = RosterImport(students, workers=1, report_path=report_path).run(path)
+        with open(report_path, newline='') as report:
+            return stats, list(csv.reader(report))
+
+    def test_blank_and_duplicate_emails_fail_per_row(self):
+        password = 'a-roster-password'
+        stats, report = self.import_roster([
+            ['first', 'first@example.com', password],
+            ['blank1', '', password],
+            ['blank2', '', password],
+            # the owner's email, once normalized
+            ['again', 'owner@EXAMPLE.com', password],
+        ])
+        self.assertEqual(stats, {'created': 1, 'failed': 3, 'skipped': 0})
+        self.assertEqual([row[:2] for row in report], [['3', 'blank1'], ['4', 'blank2'], ['5', 'again']])
+        self.assertTrue(self.institute.role_group(InstituteRole.STUDENTS).user_set.filter(username='first').exists())
+
+    def test_checkpoint_committed_with_its_batch(self):
+        password = 'a-roster-password'
+        path = self.write_roster([['user%s' % n, 'user%s@example.com' % n, password] for n in range(3)])
+        students = self.institute.role_group(InstituteRole.STUDENTS)
+        RosterImport(students, batch_size=2, workers=1).run(path)
+        checkpoint = RosterCheckpoint.objects.get(source=path, group=students)
+        self.assertEqual(checkpoint.row, 4)
+
+        # a batch that fails leaves the checkpoint of the last committed one
+        checkpoint.row = 2
+        checkpoint.save()
+        User.objects.filter(username__in=['user1', 'user2']).delete()
+        roster = RosterImport(students, batch_size=2, workers=1, resume=True)
+        with mock.patch.object(roster.manager, 'bulk_create_typed', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                roster.run(path)
+        self.assertEqual(RosterCheckpoint.objects.get(pk=checkpoint.pk).row, 2)
+
+        stats = RosterImport(students, batch_size=2, workers=1, resume=True).run(path)
+        self.assertEqual(stats, {'created': 2, 'failed': 0, 'skipped': 1})
+        self.assertEqual(RosterCheckpoint.objects.get(pk=checkpoint.pk).row, 4)
+
+
+class SeedLoadTests(TestCase):
 
-# Create your tests here.
+    def test_seed_load(self):
+        call_command('seed_load', institutes=2, users=3, stdout=StringIO())
+        self.assertEqual(Institude.objects.filter(name__startswith='seed').count(), 2)
+        self.assertEqual(PaymentStatus.objects.filter(user__username__startswith='seed_owner_').count(), 2)
+        for institute in Institude.objects.all():
+            self.assertEqual(institute.grps.count(), 5)
+        self.assertEqual(Teacher.objects.filter(username__startswith='seed_').count(), 3)
+        self.assertEqual(TeacherMore.objects.filter(user__username__startswith='seed_').count(), 3)
+        # every seeded user of a type is a member of one institute group
+        self.assertEqual(InstituteMembership.objects.filter(role='teachers').count(), 3)
@@ -7,4 +7,6 @@ urlpatterns = [
     path('groups/<int:id>/',groups_list, name='groups_list'),
     path('create_user/<int:id>/',create_user, name='create_user'),
     path('add_user/<int:id>/',add_user, name='add_user'),
+    path('add_users_stream/<int:id>/',add_users_stream, name='add_users_stream'),
+    path('user_autocomplete/<int:id>/',user_autocomplete, name='user_autocomplete'),
 ]
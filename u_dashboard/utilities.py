@@ -9,3 +9,130 @@ def get_domain(request):
     subdomain = hostname.split(":")(0).lower()
     return Domain.objects.filter(subdomain=subdomain).first()
     
+
+
+import codecs
+import csv
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from phonenumber_field.phonenumber import PhoneNumber
+from phonenumbers import NumberParseException
+
+User = get_user_model()
+
+# users resolved / added per query
+MEMBERSHIP_CHUNK_SIZE = 1000
+_PHONE_RE = re.compile(r'^\+?[\d\s().-]{6,}$')
+
+
+def parse_identifiers(text):
+    """
+    Split pasted usernames/emails/phones on commas, semicolons and whitespace.
+    Duplicates are dropped, order is kept.
+    """
+    return list(dict.fromkeys(i for i in re.split(r'[\s,;]+', text or '') if i))
+
+
+def iter_csv_identifiers(uploaded_file):
+    """
+    Stream identifiers out of an uploaded CSV file, every non-empty cell is one.
+    The file is read row by row, never loaded as a whole.
+    """
+    for row in csv.reader(codecs.iterdecode(uploaded_file, 'utf-8-sig')):
+        for cell in row:
+            cell = cell.strip()
+            if cell:
+                yield cell
+
+
+class Echo:
+    """
+    File-like object for csv.writer returning each written row
+    instead of buffering it, for streamed CSV responses.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_cell(value):
+    """
+    `value` made safe for spreadsheets: a leading =, +, -, @, tab or carriage
+    return would start a formula, a quote keeps it text.
+    """
+    value = str(value)
+    if value.startswith(('=', '+', '-', '@', '\t', '\r')):
+        return "'" + value
+    return value
+
+
+def chunked(iterable, size=MEMBERSHIP_CHUNK_SIZE):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _normalize_phone(identifier):
+    if not _PHONE_RE.match(identifier):
+        return None
+    try:
+        phone = PhoneNumber.from_string(
+            identifier, region=getattr(settings, 'PHONENUMBER_DEFAULT_REGION', None))
+    except NumberParseException:
+        return None
+    return phone.as_e164 if phone.is_valid() else None
+
+
+def resolve_users(identifiers):
+    """
+    Resolve usernames, emails and phone numbers to user ids with a single `IN` query.
+    returns: (`dict` identifier -> user id, `list` of unknown identifiers)
+    """
+    identifiers = list(dict.fromkeys(identifiers))
+    emails = [i for i in identifiers if '@' in i]
+    phones = {}
+    for identifier in identifiers:
+        phone = _normalize_phone(identifier)
+        if phone:
+            phones[phone] = identifier
+
+    query = Q(username__in=identifiers)
+    if emails:
+        query |= Q(email__in=emails)
+    if phones:
+        query |= Q(phone__in=list(phones))
+    wanted = set(identifiers)
+    found = {}
+    for user_id, username, email, phone in User.objects.filter(query).values_list(
+            'id', 'username', 'email', 'phone'):
+        for key in (username, email):
+            if key in wanted:
+                found[key] = user_id
+        if phone and phone.as_e164 in phones:
+            found[phones[phone.as_e164]] = user_id
+    unknown = [i for i in identifiers if i not in found]
+    return found, unknown
+
+
+def add_members(group, identifiers):
+    """
+    Add the users matching `identifiers` to `group`.
+    returns: (`int` number of users resolved, `list` of unknown identifiers)
+    """
+    found, unknown = resolve_users(identifiers)
+    user_ids = set(found.values())
+    if user_ids:
+        # through the related manager, so that m2m_changed is sent: it SELECTs
+        # which of the users are members already and INSERTs the others
+        # (ON CONFLICT DO NOTHING), then the receivers invalidate their cached
+        # permissions and INSERT their InstituteMembership rows
+        group.user_set.add(*user_ids)
+    return len(user_ids), unknown
@@ -1,10 +1,20 @@
+import csv
+
 from django.contrib import messages
 from django.contrib.auth.models import Group
 from django.views.generic import TemplateView
 from django.shortcuts import render, HttpResponseRedirect
-from django.http import HttpResponse
+from itertools import chain
+
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
-from institude.models import Institude
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import Count
+from django.shortcuts import get_object_or_404
+from accounts.search import autocomplete_results, search_users
+from institude.models import Institude, InstituteGroups, InstituteMembership
+from .utilities import Echo, add_members, chunked, csv_cell, iter_csv_identifiers, parse_identifiers
 
 
 # class DashboardView(TemplateView):
@@ -12,31 +22,47 @@ from institude.models import Institude
 @login_required(login_url='/user/login/')
 def dashboard(request):
     template_name = 'u_dashboard/dashboard.html'
-    try:
-        pay = request.user.payment_status
-        if pay.status:
-            status = True
-        else:
-            status = False
-    except Exception as e:
-        print(e)
-        status = False
-    if request.user:
-        ins = Institude.objects.filter(owner=request.user)
-    else:
-        ins = []
+    # payment status is loaded with the user by CachedModelBackend.get_user, no query here
+    status = request.entitlement.active
+    # one query for the institutes and their counts, one for all their groups
+    ins = (
+        Institude.objects
+        .filter(owner=request.user)
+        .annotate(
+            group_count=Count('grps', distinct=True),
+            member_count=Count('memberships__user', distinct=True),
+        )
+        # prefetched groups get `institutes` set, display_name costs no query
+        .prefetch_related('grps')
+        .order_by('name')
+    )
     context={
         'status':status,
         'ins':ins,
     }
     return render(request, template_name, context)
 
+GROUPS_PER_PAGE = 20
+
+
+@login_required(login_url='/user/login/')
 def groups_list(request, id):
-    in_need = Institude.objects.get(id=id)
-    groups = Group.objects.filter(name__istartswith=in_need.name)
+    in_need = get_object_or_404(Institude, id=id)
+    if not request.user.has_perm('institude.view_institutegroups', in_need):
+        raise PermissionDenied
+    # groups of this institute only, through the indexed `institutes` foreign key,
+    # with member counts computed in the same query
+    groups = (
+        InstituteGroups.objects
+        .filter(institutes=in_need)
+        .select_related('institutes')
+        .annotate(member_count=Count('user'))
+    )
+    page = Paginator(groups, GROUPS_PER_PAGE).get_page(request.GET.get('page'))
     template_name = 'u_dashboard/groups_list.html'
     context={
-        'groups':groups,
+        'institute': in_need,
+        'groups': page,
         'form' : SignUpForm()
     }
     return render(request, template_name, context)
@@ -44,8 +70,11 @@ def groups_list(request, id):
 from django.contrib.auth import get_user_model
 User = get_user_model()
 from accounts.forms import SignUpForm
+@login_required(login_url='/user/login/')
 def create_user(request, id):
-    grp = Group.objects.get(id=id)
+    grp = get_object_or_404(InstituteGroups.objects.select_related('institutes'), id=id)
+    if not request.user.has_perm('institude.change_institutegroups', grp):
+        raise PermissionDenied
     if request.method == 'POST':
         form = SignUpForm(request.POST, request.FILES)
         if form.errors:
@@ -57,16 +86,81 @@ def create_user(request, id):
             messages.success(request, "user created")
             grp.user_set.add(user)
         return HttpResponseRedirect(request.META.get('HTTP_REFERER'))
+@login_required(login_url='/user/login/')
 def add_user(request, id):
-    grp = Group.objects.get(id=id)
+    """
+    Add users to a group by username, email or phone. Accepts a pasted list
+    (`identifiers`, or the single `username` field) and/or a CSV `file`.
+    """
+    grp = get_object_or_404(InstituteGroups.objects.select_related('institutes'), id=id)
+    if not request.user.has_perm('institude.change_institutegroups', grp):
+        raise PermissionDenied
     if request.method == 'POST':
-        username = request.POST.get('username', None)
-        if username:
-            if User.objects.filter(username = username).exists():
-                user = User.objects.get(username = username)
-                grp.user_set.add(user)
-                messages.success(request, "user added to group")
-            else:
-                messages.warning(request, "No user found with this username")
+        identifiers = parse_identifiers(
+            request.POST.get('identifiers') or request.POST.get('username'))
+        if 'file' in request.FILES:
+            identifiers = chain(identifiers, iter_csv_identifiers(request.FILES['file']))
+        added, unknown = 0, []
+        for chunk in chunked(identifiers):
+            chunk_added, chunk_unknown = add_members(grp, chunk)
+            added += chunk_added
+            unknown += chunk_unknown
+        if added:
+            messages.success(request, "%s user(s) added to group" % added)
+        if unknown:
+            shown = ", ".join(unknown[:20])
+            more = " and %s more" % (len(unknown) - 20) if len(unknown) > 20 else ""
+            messages.warning(request, "No user found for: %s%s" % (shown, more))
+        elif not added:
+            messages.warning(request, "No user found with this username")
         return HttpResponseRedirect(request.META.get('HTTP_REFERER'))
 
+
+@login_required(login_url='/user/login/')
+def add_users_stream(request, id):
+    """
+    Variant of add_user for very large CSV uploads: users are added chunk by
+    chunk as the file is read, within the request (HistoryRequestMiddleware's
+    user, errors answered as such), then the response streams back a CSV
+    report of the unknown identifiers.
+    """
+    grp = get_object_or_404(InstituteGroups.objects.select_related('institutes'), id=id)
+    if not request.user.has_perm('institude.change_institutegroups', grp):
+        raise PermissionDenied
+    if request.method != 'POST' or 'file' not in request.FILES:
+        return HttpResponseBadRequest("POST a CSV `file`")
+    added, unknown = 0, []
+    for chunk in chunked(iter_csv_identifiers(request.FILES['file'])):
+        chunk_added, chunk_unknown = add_members(grp, chunk)
+        added += chunk_added
+        unknown += chunk_unknown
+
+    def report():
+        writer = csv.writer(Echo())
+        yield writer.writerow(["identifier", "status"])
+        for identifier in unknown:
+            yield writer.writerow([csv_cell(identifier), "unknown"])
+        yield writer.writerow(["# %s user(s) added" % added])
+
+    response = StreamingHttpResponse(report(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="group_%s_unknown.csv"' % grp.id
+    return response
+
+
+@login_required(login_url='/user/login/')
+def user_autocomplete(request, id):
+    """
+    JSON suggestions for the "Add User" modal: members of the group's
+    institute matching `q` (see accounts.search) who aren't members of
+    the group yet. Other users are added by their exact username/email/phone.
+    """
+    grp = get_object_or_404(InstituteGroups.objects.select_related('institutes'), id=id)
+    if not request.user.has_perm('institude.change_institutegroups', grp):
+        raise PermissionDenied
+    users = search_users(
+        request.GET.get('q', ''),
+        User.objects.filter(
+            pk__in=InstituteMembership.objects.filter(institute_id=grp.institutes_id).values('user_id'),
+        ).exclude(groups=grp).only('id', 'username', 'first_name', 'last_name'),
+    )
+    return JsonResponse({'results': autocomplete_results(users)})